@@ -0,0 +1,49 @@
+"""visit end_date for schedule overlap checks
+
+Revision ID: 004b1c78f5e0
+Revises: 4cb139ff6dc8
+Create Date: 2026-01-12 10:15:42.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004b1c78f5e0'
+down_revision: Union[str, Sequence[str], None] = '4cb139ff6dc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('visit', sa.Column('end_date', sa.DateTime(), nullable=True))
+
+    # заполняем end_date для существующих визитов по тем же правилам, что и _get_duration_minutes:
+    # visit.duration_minutes -> procedure.duration_minutes -> 30 минут
+    op.execute(
+        """
+        UPDATE visit
+        SET end_date = visit.date + make_interval(mins => COALESCE(
+            CASE WHEN visit.duration_minutes > 0 THEN visit.duration_minutes END,
+            (
+                SELECT CASE WHEN p.duration_minutes > 0 THEN p.duration_minutes END
+                FROM procedure p
+                WHERE p.id = visit.procedure_id
+            ),
+            30
+        ))
+        """
+    )
+
+    op.alter_column('visit', 'end_date', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_visit_dentist_id_end_date', 'visit', ['dentist_id', 'end_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_visit_dentist_id_end_date', table_name='visit')
+    op.drop_column('visit', 'end_date')
@@ -0,0 +1,37 @@
+"""payment (date, id) index for keyset pagination
+
+Revision ID: 3608f83e3272
+Revises: 7d6a0e6ab78c
+Create Date: 2026-01-23 09:38:27.615092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3608f83e3272'
+down_revision: Union[str, Sequence[str], None] = '7d6a0e6ab78c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (date, id) INCLUDE (amount) обслуживает и суммы за период, и сортировку списков
+    op.create_index(
+        'ix_payment_date_id', 'payment', ['date', 'id'], unique=False,
+        postgresql_include=['amount'],
+    )
+    op.drop_index('ix_payment_date', table_name='payment')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_payment_date', 'payment', ['date'], unique=False,
+        postgresql_include=['amount'],
+    )
+    op.drop_index('ix_payment_date_id', table_name='payment')
@@ -0,0 +1,32 @@
+"""partial patient(total_debt, id) index for debtor list
+
+Revision ID: 5e03c8d8392a
+Revises: e295af547302
+Create Date: 2026-02-05 10:27:13.940261
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e03c8d8392a'
+down_revision: Union[str, Sequence[str], None] = 'e295af547302'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # /patients/debtors: WHERE has_debt ORDER BY total_debt DESC, id DESC
+    op.create_index(
+        'ix_patient_debtors', 'patient', ['total_debt', 'id'], unique=False,
+        postgresql_where=sa.text('has_debt'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_patient_debtors', table_name='patient')
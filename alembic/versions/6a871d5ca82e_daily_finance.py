@@ -0,0 +1,50 @@
+"""daily_finance rollup
+
+Revision ID: 6a871d5ca82e
+Revises: 5e03c8d8392a
+Create Date: 2026-02-09 15:04:51.273614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a871d5ca82e'
+down_revision: Union[str, Sequence[str], None] = '5e03c8d8392a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_finance',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('income', sa.Float(), nullable=False),
+    sa.Column('debt', sa.Float(), nullable=False),
+    sa.Column('visits_count', sa.Integer(), nullable=False),
+    sa.Column('patients_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+    # начальное заполнение (повторно: python -m app.cli backfill-finance)
+    op.execute(
+        """
+        INSERT INTO daily_finance (day, income, debt, visits_count, patients_count)
+        SELECT day, SUM(amount), COALESCE(SUM(remaining), 0), COUNT(*), COUNT(DISTINCT patient_id)
+        FROM (
+            SELECT p.date::date AS day, v.id, v.patient_id, v.remaining, SUM(p.amount) AS amount
+            FROM payment p
+            JOIN visit v ON v.id = p.visit_id
+            GROUP BY p.date::date, v.id
+        ) per_visit
+        GROUP BY day
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_finance')
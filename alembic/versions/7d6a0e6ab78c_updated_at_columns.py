@@ -0,0 +1,33 @@
+"""updated_at on visit, payment, patient for ETags
+
+Revision ID: 7d6a0e6ab78c
+Revises: af05da4cab9f
+Create Date: 2026-01-19 13:21:56.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d6a0e6ab78c'
+down_revision: Union[str, Sequence[str], None] = 'af05da4cab9f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('visit', 'payment', 'patient'):
+        op.add_column(
+            table,
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('patient', 'payment', 'visit'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,47 @@
+"""daily_revenue rollup
+
+Revision ID: 925976532ceb
+Revises: 87a8ae2c725a
+Create Date: 2026-02-02 12:30:18.440716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '925976532ceb'
+down_revision: Union[str, Sequence[str], None] = '87a8ae2c725a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_revenue',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dentist_id', sa.Integer(), nullable=False),
+    sa.Column('method', postgresql.ENUM('card', 'cash', 'transfer', name='paymentmethod', create_type=False), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['dentist_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('day', 'dentist_id', 'method')
+    )
+
+    # начальное заполнение (повторно: python -m app.cli backfill-revenue)
+    op.execute(
+        """
+        INSERT INTO daily_revenue (day, dentist_id, method, amount, count)
+        SELECT p.date::date, v.dentist_id, p.method, SUM(p.amount), COUNT(*)
+        FROM payment p
+        JOIN visit v ON v.id = p.visit_id
+        GROUP BY p.date::date, v.dentist_id, p.method
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_revenue')
@@ -0,0 +1,44 @@
+"""composite indexes for dashboard and schedule queries
+
+Revision ID: af05da4cab9f
+Revises: e655d23ca181
+Create Date: 2026-01-16 11:47:03.902614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'af05da4cab9f'
+down_revision: Union[str, Sequence[str], None] = 'e655d23ca181'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (dentist_id, date) покрывает и одиночный фильтр по dentist_id
+    op.create_index('ix_visit_dentist_id_date', 'visit', ['dentist_id', 'date'], unique=False)
+    op.drop_index(op.f('ix_visit_dentist_id'), table_name='visit')
+
+    op.create_index(
+        'ix_payment_date', 'payment', ['date'], unique=False,
+        postgresql_include=['amount'],
+    )
+    op.create_index(
+        'ix_payment_visit_id', 'payment', ['visit_id'], unique=False,
+        postgresql_include=['date', 'amount'],
+    )
+    op.create_index('ix_payment_patient_id', 'payment', ['patient_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payment_patient_id', table_name='payment')
+    op.drop_index('ix_payment_visit_id', table_name='payment')
+    op.drop_index('ix_payment_date', table_name='payment')
+    op.create_index(op.f('ix_visit_dentist_id'), 'visit', ['dentist_id'], unique=False)
+    op.drop_index('ix_visit_dentist_id_date', table_name='visit')
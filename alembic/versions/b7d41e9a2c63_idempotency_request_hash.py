@@ -0,0 +1,28 @@
+"""bind idempotency keys to the request body hash
+
+Revision ID: b7d41e9a2c63
+Revises: f0c66d794db2
+Create Date: 2026-02-12 09:21:37.104518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e9a2c63'
+down_revision: Union[str, Sequence[str], None] = 'f0c66d794db2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('idempotency_key', sa.Column('request_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('idempotency_key', 'request_hash')
@@ -0,0 +1,33 @@
+"""partial visit(date) index for debt aging
+
+Revision ID: e295af547302
+Revises: 925976532ceb
+Create Date: 2026-02-03 11:12:40.508917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e295af547302'
+down_revision: Union[str, Sequence[str], None] = '925976532ceb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # только визиты с долгом; INCLUDE даёт index-only scan для группировки по пациенту/врачу
+    op.create_index(
+        'ix_visit_date_debt', 'visit', ['date'], unique=False,
+        postgresql_where=sa.text('remaining > 0'),
+        postgresql_include=['patient_id', 'dentist_id', 'remaining'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_visit_date_debt', table_name='visit')
@@ -0,0 +1,31 @@
+"""visit (date, id) index for keyset pagination
+
+Revision ID: e655d23ca181
+Revises: 004b1c78f5e0
+Create Date: 2026-01-14 16:02:11.540927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e655d23ca181'
+down_revision: Union[str, Sequence[str], None] = '004b1c78f5e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (date, id) покрывает всё, для чего был нужен ix_visit_date
+    op.create_index('ix_visit_date_id', 'visit', ['date', 'id'], unique=False)
+    op.drop_index(op.f('ix_visit_date'), table_name='visit')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_visit_date'), 'visit', ['date'], unique=False)
+    op.drop_index('ix_visit_date_id', table_name='visit')
@@ -0,0 +1,43 @@
+"""cap visit duration so date-range scans have a lower bound
+
+Revision ID: f0c66d794db2
+Revises: 6a871d5ca82e
+Create Date: 2026-02-11 10:48:05.391742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0c66d794db2'
+down_revision: Union[str, Sequence[str], None] = '6a871d5ca82e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# app.models.visit.MAX_VISIT_DURATION_MIN на момент миграции
+MAX_VISIT_DURATION_MIN = 8 * 60
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # старые визиты длиннее лимита обрезаются, иначе CHECK не создать
+    op.execute(
+        f"""
+        UPDATE visit
+        SET end_date = date + interval '{MAX_VISIT_DURATION_MIN} minutes',
+            duration_minutes = {MAX_VISIT_DURATION_MIN}
+        WHERE end_date > date + interval '{MAX_VISIT_DURATION_MIN} minutes'
+        """
+    )
+    op.create_check_constraint(
+        'ck_visit_max_duration', 'visit',
+        f"end_date <= date + interval '{MAX_VISIT_DURATION_MIN} minutes'",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ck_visit_max_duration', 'visit', type_='check')
@@ -1,19 +1,27 @@
 from datetime import datetime, timedelta, date
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, select, and_
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import Date, DateTime, String, and_, cast, func, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import fan_out, get_db
 from app.models.visit import Visit, VisitStatus
 from app.models.payment import Payment
+from app.models.daily_finance import DailyFinance
+from app.models.daily_revenue import DailyRevenue
 from app.models.patient import Patient
 from app.models.user import User, UserRole
 from app.schemas.dashboard import (
     AdminDashboard,
     AdminFinanceItem,
     AdminStaffItem,
+    DebtAging,
+    DebtAgingBuckets,
+    DebtAgingDentistItem,
+    DebtAgingPatientItem,
+    FinanceGranularity,
     DentistDashboard,
     DentistActiveVisit,
     VisitShort,
@@ -21,10 +29,221 @@ from app.schemas.dashboard import (
     ManagerScheduleItem,
 )
 from app.core.deps import role_required, get_current_user
+from app.core.etag import is_not_modified, not_modified, weak_etag
+from app.services.dashboard_cache import dashboard_cache
+from app.services.procedure_catalog import ProcedureInfo, procedure_catalog
+from app.services.revenue import finance_rows
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
+def _revenue(*conditions):
+    """Сумма выручки из дневного роллапа daily_revenue (а не из payment)."""
+    stmt = select(func.coalesce(func.sum(DailyRevenue.amount), 0.0))
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    return stmt
+
+
+def _cached(endpoint: str, user: User, tables: Sequence[str], *params):
+    """
+    Ключ кэша дашборда, поколения его таблиц (снятые до расчёта) и готовый ответ,
+    если он есть и не устарел.
+    """
+    key = (endpoint, user.role, user.id, *params)
+    generation = dashboard_cache.generation(tables)
+    return key, generation, dashboard_cache.get(key, generation)
+
+
+async def _all(db: AsyncSession, stmt) -> list:
+    """ORM-объекты запроса списком (для fan_out: загружаются до закрытия сессии)."""
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+def _revenue_sum(*conditions):
+    """Агрегат выручки по daily_revenue: SUM(amount) FILTER (WHERE conditions)."""
+    total = func.sum(DailyRevenue.amount)
+    if conditions:
+        total = total.filter(and_(*conditions))
+    return func.coalesce(total, 0.0)
+
+
+def _procedure_name(visit: Visit, catalog: Dict[int, ProcedureInfo]) -> str:
+    """Название процедуры: из визита, иначе из справочника по procedure_id."""
+    if visit.procedure:
+        return visit.procedure
+    proc = catalog.get(visit.procedure_id) if visit.procedure_id else None
+    return proc.name if proc else ""
+
+
+def _total_amount(visit: Visit, catalog: Dict[int, ProcedureInfo]) -> float:
+    """Сумма визита; пока врач её не поставил — базовая цена процедуры из справочника."""
+    if visit.total_amount is not None:
+        return visit.total_amount
+    proc = catalog.get(visit.procedure_id) if visit.procedure_id else None
+    return float(proc.base_price or 0.0) if proc else 0.0
+
+
+# ---------- запросы ----------
+# Роуты исполняют запросы, собранные здесь, а tests/test_indexes_pg.py делает
+# по этим же функциям EXPLAIN: изменение запроса сразу проверяется на индексы.
+
+
+def _income_periods(today: date):
+    """Начала недели, месяца и предыдущего месяца для сравнения выручки."""
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    prev_month_ago = month_ago - timedelta(days=30)
+    return week_ago, month_ago, prev_month_ago
+
+
+def _total_debt_stmt():
+    """
+    Общий долг. Визиты без остатка сумму не меняют, поэтому отбрасываются:
+    читается частичный индекс ix_visit_date_debt, а не вся таблица.
+    """
+    return select(func.coalesce(func.sum(Visit.remaining), 0.0)).where(
+        Visit.remaining > literal_column("0")
+    )
+
+
+def _admin_dashboard_stmt(today: date):
+    week_ago, month_ago, prev_month_ago = _income_periods(today)
+    return select(
+        select(func.count(Visit.id)).scalar_subquery().label("total_visits"),
+        select(func.count(Patient.id)).scalar_subquery().label("total_patients"),
+        _total_debt_stmt().scalar_subquery().label("total_debt"),
+        _revenue_sum().label("total_income"),
+        _revenue_sum(DailyRevenue.day >= week_ago).label("income_week"),
+        _revenue_sum(DailyRevenue.day >= month_ago).label("income_month"),
+        _revenue_sum(
+            DailyRevenue.day >= prev_month_ago, DailyRevenue.day < month_ago
+        ).label("prev_month_income"),
+    )
+
+
+def _admin_finance_stmt(
+    date_from: date,
+    date_to: date,
+    granularity: FinanceGranularity,
+    dims: Sequence = (),
+):
+    """
+    По дням без разбивки — готовые строки daily_finance (см. app/services/revenue.py);
+    иначе один сгруппированный запрос по payment + visit.
+    """
+    if granularity == FinanceGranularity.day and not dims:
+        return (
+            select(
+                cast(DailyFinance.day, DateTime).label("bucket"),
+                DailyFinance.income,
+                DailyFinance.debt,
+                DailyFinance.visits_count,
+                DailyFinance.patients_count,
+            )
+            .where(DailyFinance.day >= date_from, DailyFinance.day <= date_to)
+            .order_by(DailyFinance.day)
+        )
+
+    # единица — константой, чтобы date_trunc в SELECT и GROUP BY совпали
+    bucket = func.date_trunc(literal_column(f"'{granularity.value}'"), Payment.date)
+    stmt = finance_rows(
+        bucket,
+        Payment.date >= datetime.combine(date_from, datetime.min.time()),
+        Payment.date <= datetime.combine(date_to, datetime.max.time()),
+        dims=dims,
+    )
+    columns = stmt.selected_columns
+    return stmt.order_by(columns.bucket, *(columns[dim.key] for dim in dims))
+
+
+def _staff_stmt():
+    return select(User).where(User.role.in_([UserRole.dentist, UserRole.manager]))
+
+
+def _day_visits_stmt(day: date, dentist_id: Optional[int] = None):
+    """Визиты дня (всех врачей или одного) по времени."""
+    stmt = select(Visit).where(
+        Visit.date >= datetime.combine(day, datetime.min.time()),
+        Visit.date <= datetime.combine(day, datetime.max.time()),
+    )
+    if dentist_id is not None:
+        stmt = stmt.where(Visit.dentist_id == dentist_id)
+    return stmt.order_by(Visit.date)
+
+
+def _dentist_income_stmts(dentist_id: int, today: date):
+    """Доход врача за неделю, месяц и предыдущий месяц (дневной роллап по врачу)."""
+    week_ago, month_ago, prev_month_ago = _income_periods(today)
+    return (
+        _revenue(DailyRevenue.dentist_id == dentist_id, DailyRevenue.day >= week_ago),
+        _revenue(DailyRevenue.dentist_id == dentist_id, DailyRevenue.day >= month_ago),
+        _revenue(
+            DailyRevenue.dentist_id == dentist_id,
+            DailyRevenue.day >= prev_month_ago,
+            DailyRevenue.day < month_ago,
+        ),
+    )
+
+
+# границы корзин старения долга, в днях от даты визита
+DEBT_AGING_BUCKETS = (
+    ("days0to30", None, 30),
+    ("days31to60", 31, 60),
+    ("days61to90", 61, 90),
+    ("days90plus", 91, None),
+)
+
+
+def _debt_aging_stmt(today: date):
+    """
+    GROUPING SETS ((patient_id), (dentist_id), ()) по визитам с remaining > 0
+    (частичный индекс ix_visit_date_debt), корзины — SUM(...) FILTER (WHERE возраст в диапазоне).
+    """
+    age = literal(today, Date) - cast(Visit.date, Date)
+
+    buckets = []
+    for name, low, high in DEBT_AGING_BUCKETS:
+        conditions = []
+        if low is not None:
+            conditions.append(age >= low)
+        if high is not None:
+            conditions.append(age <= high)
+        buckets.append(
+            func.coalesce(func.sum(Visit.remaining).filter(and_(*conditions)), 0.0).label(name)
+        )
+
+    return (
+        select(
+            func.grouping(Visit.patient_id).label("g_patient"),
+            func.grouping(Visit.dentist_id).label("g_dentist"),
+            Visit.patient_id,
+            Visit.dentist_id,
+            *buckets,
+            # строка пустого набора () приходит и без долгов — с NULL вместо суммы
+            func.coalesce(func.sum(Visit.remaining), 0.0).label("total"),
+        )
+        # константа инлайном, а не параметром — иначе частичный индекс не подходит под generic plan
+        .where(Visit.remaining > literal_column("0"))
+        .group_by(
+            func.grouping_sets(tuple_(Visit.patient_id), tuple_(Visit.dentist_id), tuple_())
+        )
+    )
+
+
+def _schedule_version_stmt(day: date):
+    """md5 по (id, updated_at) всех визитов дня — версия расписания для ETag."""
+    row_versions = func.string_agg(
+        cast(Visit.id, String) + ":" + cast(Visit.updated_at, String),
+        aggregate_order_by(literal_column("','"), Visit.id),
+    )
+    return select(func.md5(row_versions)).where(
+        Visit.date >= datetime.combine(day, datetime.min.time()),
+        Visit.date <= datetime.combine(day, datetime.max.time()),
+    )
+
+
 # ---------- ADMIN ----------
 
 @router.get("/admin", response_model=AdminDashboard)
@@ -32,42 +251,35 @@ async def admin_dashboard(
     db: AsyncSession = Depends(get_db),
     admin=Depends(role_required(UserRole.admin)),
 ):
-    total_visits = await db.scalar(select(func.count(Visit.id)))
-    total_patients = await db.scalar(select(func.count(Patient.id)))
-    total_income = await db.scalar(select(func.coalesce(func.sum(Payment.amount), 0.0)))
-    total_debt = await db.scalar(select(func.coalesce(func.sum(Visit.remaining), 0.0)))
-
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-    prev_month_ago = month_ago - timedelta(days=30)
+    """
+    Все цифры — одним запросом: выручка из daily_revenue через SUM(...) FILTER
+    по периодам, счётчики визитов/пациентов и долг — скалярными подзапросами.
+    """
+    # роллап дневной, поэтому периоды считаются целыми днями
+    today = datetime.utcnow().date()
+    key, generation, cached = _cached("admin", admin, ("visit", "patient", "payment"), today)
+    if cached is not None:
+        return cached
 
-    income_week = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0)).where(Payment.date >= week_ago)
-    )
-    income_month = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0)).where(Payment.date >= month_ago)
-    )
-    prev_month_income = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0)).where(
-            Payment.date >= prev_month_ago, Payment.date < month_ago
-        )
-    )
+    row = (await db.execute(_admin_dashboard_stmt(today))).one()
 
-    if prev_month_income == 0:
-        percent_change = 100.0 if income_month and income_month > 0 else 0.0
+    if row.prev_month_income == 0:
+        percent_change = 100.0 if row.income_month and row.income_month > 0 else 0.0
     else:
-        percent_change = float(income_month - prev_month_income) / float(prev_month_income) * 100.0
+        percent_change = (
+            float(row.income_month - row.prev_month_income) / float(row.prev_month_income) * 100.0
+        )
 
-    return AdminDashboard(
-        totalVisits=int(total_visits or 0),
-        totalPatients=int(total_patients or 0),
-        totalIncome=float(total_income or 0),
-        totalDebt=float(total_debt or 0),
-        incomeWeek=float(income_week or 0),
-        incomeMonth=float(income_month or 0),
+    result = AdminDashboard(
+        totalVisits=int(row.total_visits or 0),
+        totalPatients=int(row.total_patients or 0),
+        totalIncome=float(row.total_income or 0),
+        totalDebt=float(row.total_debt or 0),
+        incomeWeek=float(row.income_week or 0),
+        incomeMonth=float(row.income_month or 0),
         percentChange=float(percent_change),
     )
+    return dashboard_cache.put(key, generation, result)
 
 
 @router.get("/admin/finance", response_model=List[AdminFinanceItem])
@@ -76,9 +288,16 @@ async def admin_finance(
     admin=Depends(role_required(UserRole.admin)),
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
+    granularity: FinanceGranularity = Query(FinanceGranularity.day),
+    by_dentist: bool = Query(False),
+    by_method: bool = Query(False),
 ):
     """
-    Финансы по дням: AdminFinanceModel
+    Финансы по периодам: AdminFinanceModel.
+    granularity — день/неделя/месяц (date_trunc в SQL), by_dentist / by_method —
+    разбивка периода по врачу / способу оплаты.
+    visitsCount / patientsCount — разные визиты и пациенты с платежами за период.
+    Запрос — _admin_finance_stmt.
     """
     # по умолчанию последние 30 дней
     if not date_to:
@@ -86,53 +305,44 @@ async def admin_finance(
     if not date_from:
         date_from = date_to - timedelta(days=30)
 
-    stmt = (
-        select(
-            func.date(Payment.date).label("dt"),
-            func.coalesce(func.sum(Payment.amount), 0.0).label("income"),
-            func.coalesce(func.sum(Payment.amount), 0.0).label("paid"),
-            func.coalesce(
-                func.sum(
-                    func.case(
-                        (Visit.remaining > 0, Visit.remaining),
-                        else_=0.0,
-                    )
-                ),
-                0.0,
-            ).label("debt"),
-            func.count(Visit.id).label("visits_count"),
-            func.count(Patient.id).label("patients_count"),
-        )
-        .select_from(Payment)
-        .join(Visit, Visit.id == Payment.visit_id)
-        .join(Patient, Patient.id == Payment.patient_id)
-        .where(
-            and_(
-                Payment.date >= datetime.combine(date_from, datetime.min.time()),
-                Payment.date <= datetime.combine(date_to, datetime.max.time()),
-            )
-        )
-        .group_by(func.date(Payment.date))
-        .order_by(func.date(Payment.date))
+    key, generation, cached = _cached(
+        "admin/finance",
+        admin,
+        ("visit", "payment"),
+        date_from,
+        date_to,
+        granularity,
+        by_dentist,
+        by_method,
     )
+    if cached is not None:
+        return cached
 
-    result = await db.execute(stmt)
+    dims = []
+    if by_dentist:
+        dims.append(Visit.dentist_id)
+    if by_method:
+        dims.append(Payment.method)
+
+    result = await db.execute(_admin_finance_stmt(date_from, date_to, granularity, dims))
     rows = result.all()
 
     items: List[AdminFinanceItem] = []
     for row in rows:
         items.append(
             AdminFinanceItem(
-                date=row.dt,
+                date=row.bucket,
                 income=row.income,
-                paid=row.paid,
+                paid=row.income,
                 debt=row.debt,
                 visitsCount=row.visits_count,
                 patientsCount=row.patients_count,
+                dentistId=row.dentist_id if by_dentist else None,
+                method=row.method if by_method else None,
             )
         )
 
-    return items
+    return dashboard_cache.put(key, generation, items)
 
 
 @router.get("/admin/staff", response_model=List[AdminStaffItem])
@@ -143,9 +353,7 @@ async def admin_staff(
     """
     Список персонала (стоматологи + менеджеры) под AdminStaffModel.
     """
-    result = await db.execute(
-        select(User).where(User.role.in_([UserRole.dentist, UserRole.manager]))
-    )
+    result = await db.execute(_staff_stmt())
     users = result.scalars().all()
 
     items: List[AdminStaffItem] = []
@@ -175,70 +383,26 @@ async def dentist_dashboard(
     - визиты на сегодня
     - доход за неделю/месяц
     - активный визит
+
+    Запросы независимы и идут параллельно на соединениях из пула (fan_out).
     """
     today = datetime.utcnow().date()
-    start_today = datetime.combine(today, datetime.min.time())
-    end_today = datetime.combine(today, datetime.max.time())
-
-    # визиты текущего стоматолога на сегодня
-    result = await db.execute(
-        select(Visit)
-        .where(
-            and_(
-                Visit.dentist_id == dentist.id,
-                Visit.date >= start_today,
-                Visit.date <= end_today,
-            )
-        )
-        .order_by(Visit.date)
-    )
-    today_visits = result.scalars().all()
-
-    # доход стоматолога за неделю/месяц (по связанным платежам)
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    month_ago = datetime.utcnow() - timedelta(days=30)
-
-    income_week = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0)).where(
-            and_(
-                Payment.visit_id == Visit.id,
-            )
-        )
-    )
-    # упрощённо считаем по всем платежам этого стоматолога
-    income_week = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0))
-        .join(Visit, Visit.id == Payment.visit_id)
-        .where(
-            and_(
-                Visit.dentist_id == dentist.id,
-                Payment.date >= week_ago,
-            )
-        )
-    )
-    income_month = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0))
-        .join(Visit, Visit.id == Payment.visit_id)
-        .where(
-            and_(
-                Visit.dentist_id == dentist.id,
-                Payment.date >= month_ago,
-            )
-        )
-    )
-
-    # динамика (для простоты сравнение с предыдущим месяцем)
-    prev_month_ago = month_ago - timedelta(days=30)
-    prev_month_income = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0))
-        .join(Visit, Visit.id == Payment.visit_id)
-        .where(
-            and_(
-                Visit.dentist_id == dentist.id,
-                Payment.date >= prev_month_ago,
-                Payment.date < month_ago,
-            )
-        )
+    key, generation, cached = _cached("dentist", dentist, ("visit", "payment"), today)
+    if cached is not None:
+        return cached
+
+    # визиты стоматолога на сегодня и его доход за неделю/месяц;
+    # динамика — для простоты сравнение с предыдущим месяцем
+    today_visits_stmt = _day_visits_stmt(today, dentist.id)
+    week_stmt, month_stmt, prev_month_stmt = _dentist_income_stmts(dentist.id, today)
+
+    today_visits, income_week, income_month, prev_month_income, catalog = await fan_out(
+        db,
+        lambda s: _all(s, today_visits_stmt),
+        lambda s: s.scalar(week_stmt),
+        lambda s: s.scalar(month_stmt),
+        lambda s: s.scalar(prev_month_stmt),
+        procedure_catalog.snapshot,
     )
 
     if prev_month_income == 0:
@@ -254,8 +418,8 @@ async def dentist_dashboard(
         active_visit = DentistActiveVisit(
             visitId=active.id,
             patientName=str(active.patient_id),  # при желании можно сделать join на Patient
-            procedure=active.procedure,
-            totalAmount=active.total_amount,
+            procedure=_procedure_name(active, catalog),
+            totalAmount=_total_amount(active, catalog),
             paidAmount=active.paid_amount,
             remaining=active.remaining,
             visitTime=active.date,
@@ -268,9 +432,9 @@ async def dentist_dashboard(
             VisitShort(
                 id=v.id,
                 patientName=str(v.patient_id),
-                procedure=v.procedure,
+                procedure=_procedure_name(v, catalog),
                 date=v.date,
-                totalAmount=v.total_amount,
+                totalAmount=_total_amount(v, catalog),
                 paidAmount=v.paid_amount,
                 remaining=v.remaining,
                 paymentStatus=v.payment_status.value,
@@ -278,7 +442,7 @@ async def dentist_dashboard(
             )
         )
 
-    return DentistDashboard(
+    result = DentistDashboard(
         totalVisitsToday=len(today_visits),
         incomeWeek=float(income_week or 0),
         incomeMonth=float(income_month or 0),
@@ -286,6 +450,7 @@ async def dentist_dashboard(
         activeVisit=active_visit,
         todayVisits=today_short,
     )
+    return dashboard_cache.put(key, generation, result)
 
 
 # ---------- MANAGER ----------
@@ -295,40 +460,28 @@ async def manager_dashboard(
     db: AsyncSession = Depends(get_db),
     manager=Depends(role_required(UserRole.manager)),
 ):
+    """Запросы независимы и идут параллельно на соединениях из пула (fan_out)."""
     today = datetime.utcnow().date()
-    start_today = datetime.combine(today, datetime.min.time())
-    end_today = datetime.combine(today, datetime.max.time())
-
-    # визиты сегодня
-    result = await db.execute(
-        select(Visit).where(
-            and_(
-                Visit.date >= start_today,
-                Visit.date <= end_today,
-            )
-        )
+    key, generation, cached = _cached("manager", manager, ("visit", "payment"), today)
+    if cached is not None:
+        return cached
+
+    # визиты сегодня, выручка за сегодня, общий долг
+    visits_today, total_income_today, total_debt = await fan_out(
+        db,
+        lambda s: _all(s, _day_visits_stmt(today)),
+        lambda s: s.scalar(_revenue(DailyRevenue.day == today)),
+        lambda s: s.scalar(_total_debt_stmt()),
     )
-    visits_today = result.scalars().all()
 
     total_visits_today = len(visits_today)
     patients_ids = {v.patient_id for v in visits_today}
     total_patients_today = len(patients_ids)
 
-    total_income_today = await db.scalar(
-        select(func.coalesce(func.sum(Payment.amount), 0.0)).where(
-            and_(
-                Payment.date >= start_today,
-                Payment.date <= end_today,
-            )
-        )
-    )
-
-    total_debt = await db.scalar(select(func.coalesce(func.sum(Visit.remaining), 0.0)))
-
     upcoming_visits = sum(1 for v in visits_today if v.visit_status == VisitStatus.scheduled)
     completed_visits = sum(1 for v in visits_today if v.visit_status == VisitStatus.completed)
 
-    return ManagerDashboard(
+    result = ManagerDashboard(
         totalVisitsToday=total_visits_today,
         totalPatientsToday=total_patients_today,
         totalIncomeToday=float(total_income_today or 0),
@@ -336,33 +489,76 @@ async def manager_dashboard(
         upcomingVisits=upcoming_visits,
         completedVisits=completed_visits,
     )
+    return dashboard_cache.put(key, generation, result)
+
+
+@router.get("/manager/debt-aging", response_model=DebtAging)
+async def manager_debt_aging(
+    db: AsyncSession = Depends(get_db),
+    manager=Depends(role_required(UserRole.manager)),
+):
+    """
+    Старение долга: остаток по визитам в корзинах 0–30, 31–60, 61–90, 90+ дней
+    по пациентам, по врачам и в целом.
+
+    Один запрос (_debt_aging_stmt): GROUPING SETS по визитам с remaining > 0.
+    """
+    today = datetime.utcnow().date()
+    key, generation, cached = _cached("manager/debt-aging", manager, ("visit",), today)
+    if cached is not None:
+        return cached
+
+    rows = (await db.execute(_debt_aging_stmt(today))).all()
+
+    total = DebtAgingBuckets(days0to30=0, days31to60=0, days61to90=0, days90plus=0, total=0)
+    by_patient: List[DebtAgingPatientItem] = []
+    by_dentist: List[DebtAgingDentistItem] = []
+    for row in rows:
+        values = {name: float(row._mapping[name]) for name, _, _ in DEBT_AGING_BUCKETS}
+        values["total"] = float(row.total)
+        if row.g_patient == 0:
+            by_patient.append(DebtAgingPatientItem(patientId=row.patient_id, **values))
+        elif row.g_dentist == 0:
+            by_dentist.append(DebtAgingDentistItem(dentistId=row.dentist_id, **values))
+        else:
+            total = DebtAgingBuckets(**values)
+
+    # крупные должники сверху
+    by_patient.sort(key=lambda item: item.total, reverse=True)
+    by_dentist.sort(key=lambda item: item.total, reverse=True)
+
+    result = DebtAging(asOf=today, total=total, byPatient=by_patient, byDentist=by_dentist)
+    return dashboard_cache.put(key, generation, result)
 
 
 @router.get("/manager/schedule", response_model=ManagerScheduleItem)
 async def manager_schedule(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     manager=Depends(role_required(UserRole.manager)),
     date_value: Optional[date] = Query(None, alias="date"),
 ):
     """
     Расписание на день: ManagerScheduleModel
+
+    ETag — md5 по (id, updated_at) всех визитов дня (один агрегат) и отпечаток
+    справочника процедур, которым рендерится ответ, поэтому опрос без
+    изменений — 304 без загрузки визитов. max(updated_at) не годится:
+    updated_at — время начала транзакции, и транзакция, закоммиченная позже,
+    может записать время раньше уже отданного максимума.
     """
     if not date_value:
         date_value = datetime.utcnow().date()
 
-    start_day = datetime.combine(date_value, datetime.min.time())
-    end_day = datetime.combine(date_value, datetime.max.time())
+    version = await db.scalar(_schedule_version_stmt(date_value))
+    catalog = await procedure_catalog.snapshot(db)
+    etag = weak_etag("schedule", date_value, version, procedure_catalog.fingerprint)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
 
-    result = await db.execute(
-        select(Visit)
-        .where(
-            and_(
-                Visit.date >= start_day,
-                Visit.date <= end_day,
-            )
-        )
-        .order_by(Visit.date)
-    )
+    result = await db.execute(_day_visits_stmt(date_value))
     visits = result.scalars().all()
 
     visits_short: List[VisitShort] = []
@@ -371,9 +567,9 @@ async def manager_schedule(
             VisitShort(
                 id=v.id,
                 patientName=str(v.patient_id),
-                procedure=v.procedure,
+                procedure=_procedure_name(v, catalog),
                 date=v.date,
-                totalAmount=v.total_amount,
+                totalAmount=_total_amount(v, catalog),
                 paidAmount=v.paid_amount,
                 remaining=v.remaining,
                 paymentStatus=v.payment_status.value,
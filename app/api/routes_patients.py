@@ -1,23 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, tuple_
+from typing import List, Optional
 
 from app.db.session import get_db
-from app.schemas.patient import PatientCreate, PatientRead
+from app.schemas.patient import PatientCreate, PatientPage, PatientRead
 from app.models.patient import Patient
 from app.core.deps import get_current_user
+from app.core.etag import is_not_modified, not_modified, weak_etag
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.services.dashboard_cache import dashboard_cache
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+_PATIENT_READ_COLUMNS = (
+    Patient.id,
+    Patient.full_name,
+    Patient.phone,
+    Patient.email,
+    Patient.total_debt,
+    Patient.last_visit_date,
+    Patient.has_debt,
+)
+
+
+def _patients_stmt():
+    # только колонки PatientRead, без ORM-объектов
+    return select(*_PATIENT_READ_COLUMNS)
+
+
+def _debtors_page_stmt(*, cursor: Optional[str], limit: int):
+    """Должники, крупные сверху, keyset по (total_debt, id); на строку больше limit."""
+    stmt = select(*_PATIENT_READ_COLUMNS).where(Patient.has_debt)
+    if cursor:
+        after_debt, after_id = decode_cursor(cursor, float, int)
+        stmt = stmt.where(tuple_(Patient.total_debt, Patient.id) < tuple_(after_debt, after_id))
+    return stmt.order_by(Patient.total_debt.desc(), Patient.id.desc()).limit(limit + 1)
+
 
 @router.get("/", response_model=List[PatientRead])
 async def list_patients(
     db: AsyncSession = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    result = await db.execute(select(Patient))
-    return result.scalars().all()
+    result = await db.execute(_patients_stmt())
+    return result.all()
+
+
+@router.get("/debtors", response_model=PatientPage)
+async def list_debtors(
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+):
+    """
+    Пациенты с долгом, крупные сверху, постранично по ключу (total_debt, id):
+    следующую страницу запрашивать с cursor=next_cursor.
+    Читается только частичный индекс ix_patient_debtors.
+    """
+    result = await db.execute(_debtors_page_stmt(cursor=cursor, limit=limit))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].total_debt, rows[-1].id)
+
+    return PatientPage(items=rows, next_cursor=next_cursor)
+
+
+@router.get("/{patient_id}", response_model=PatientRead)
+async def get_patient(
+    patient_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Получить пациента по id.
+    Отдаёт ETag по updated_at; при совпадении If-None-Match — 304 без тела.
+    """
+    result = await db.execute(
+        select(*_PATIENT_READ_COLUMNS, Patient.updated_at).where(Patient.id == patient_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(404, "Пациент не найден")
+
+    etag = weak_etag("patient", row.id, row.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    return row
 
 
 @router.post("/", response_model=PatientRead)
@@ -33,5 +110,6 @@ async def create_patient(
     )
     db.add(patient)
     await db.commit()
+    dashboard_cache.bump("patient")
     await db.refresh(patient)
     return patient
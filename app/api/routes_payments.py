@@ -1,38 +1,73 @@
+import csv
+import io
+import json
 from datetime import date, datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, and_, func, join
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select, and_, join, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
-from app.models.payment import Payment, PaymentMethod, PaymentType
-from app.models.visit import Visit, PaymentStatus
-from app.models.patient import Patient
+from app.models.payment import Payment
+from app.models.visit import Visit
 from app.models.user import UserRole
-from app.schemas.payment import PaymentCreate, PaymentRead
-from app.schemas.dashboard import ManagerPaymentItem
+from app.schemas.payment import PaymentCreate, PaymentRead, PaymentPage, PaymentImportResult
+from app.schemas.dashboard import ManagerPaymentPage
 from app.core.deps import get_current_user, role_required
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.services.export import ExportFormat, export_response
+from app.services.ledger import apply_payment, import_payments
+from app.services.idempotency import idempotency_store, request_hash
+from app.services.dashboard_cache import dashboard_cache
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
+MAX_IMPORT_ROWS = 5000
+_payment_list = TypeAdapter(List[PaymentCreate])
 
-@router.get("/", response_model=List[PaymentRead])
-async def list_payments(
-    db: AsyncSession = Depends(get_db),
-    current_user=Depends(get_current_user),
-    date_from: Optional[date] = Query(None),
-    date_to: Optional[date] = Query(None),
-    patient_id: Optional[int] = Query(None),
-    visit_id: Optional[int] = Query(None),
-):
-    stmt = select(Payment)
-    conditions = []
 
+def _page_conditions(
+    *,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    cursor: Optional[str],
+) -> list:
+    """Фильтр по датам платежа + keyset по (Payment.date, Payment.id) для сортировки DESC."""
+    conditions = []
     if date_from:
         conditions.append(Payment.date >= datetime.combine(date_from, datetime.min.time()))
     if date_to:
         conditions.append(Payment.date <= datetime.combine(date_to, datetime.max.time()))
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, datetime, int)
+        conditions.append(tuple_(Payment.date, Payment.id) < tuple_(after_date, after_id))
+    return conditions
+
+
+def _payment_page_stmt(
+    *,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    patient_id: Optional[int],
+    visit_id: Optional[int],
+    cursor: Optional[str],
+    limit: int,
+):
+    # только колонки PaymentRead, без ORM-объектов
+    stmt = select(
+        Payment.id,
+        Payment.visit_id,
+        Payment.patient_id,
+        Payment.amount,
+        Payment.method,
+        Payment.date,
+        Payment.payment_type,
+    )
+    conditions = _page_conditions(date_from=date_from, date_to=date_to, cursor=cursor)
     if patient_id:
         conditions.append(Payment.patient_id == patient_id)
     if visit_id:
@@ -40,9 +75,42 @@ async def list_payments(
 
     if conditions:
         stmt = stmt.where(and_(*conditions))
+    return stmt.order_by(Payment.date.desc(), Payment.id.desc()).limit(limit + 1)
+
+
+@router.get("/", response_model=PaymentPage)
+async def list_payments(
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    patient_id: Optional[int] = Query(None),
+    visit_id: Optional[int] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+):
+    """
+    Платежи, новые сверху, постранично по ключу (date, id):
+    следующую страницу запрашивать с cursor=next_cursor.
+    """
+    result = await db.execute(
+        _payment_page_stmt(
+            date_from=date_from,
+            date_to=date_to,
+            patient_id=patient_id,
+            visit_id=visit_id,
+            cursor=cursor,
+            limit=limit,
+        )
+    )
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
 
-    result = await db.execute(stmt.order_by(Payment.date.desc()))
-    return result.scalars().all()
+    return PaymentPage(items=rows, next_cursor=next_cursor)
 
 
 @router.post("/", response_model=PaymentRead)
@@ -50,108 +118,151 @@ async def create_payment(
     data: PaymentCreate,
     db: AsyncSession = Depends(get_db),
     current_user=Depends(role_required(UserRole.manager)),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
-    Создать платёж по визиту:
+    Создать платёж по визиту — одним SQL-выражением (см. apply_payment):
     - Создаёт запись в payments
     - Обновляет paid_amount, remaining, payment_status у Visit
-    - Обновляет total_debt / has_debt у Patient
+    - Сдвигает total_debt / has_debt у Patient на изменение remaining
+
+    Повтор с тем же Idempotency-Key возвращает сохранённый ответ, не создавая платёж.
     """
-    visit = await db.get(Visit, data.visit_id)
-    if not visit:
-        raise HTTPException(404, "Визит не найден")
+    scope = f"payments:create:{current_user.id}"
+    payload_hash = request_hash(data)
+    stored = await idempotency_store.lookup(db, scope, idempotency_key, payload_hash)
+    if stored is not None:
+        return stored
 
-    patient = await db.get(Patient, data.patient_id)
-    if not patient:
+    payment = await apply_payment(db, data)
+    if payment is None:
+        await db.rollback()
+        if not await db.get(Visit, data.visit_id):
+            raise HTTPException(404, "Визит не найден")
         raise HTTPException(404, "Пациент не найден")
 
-    payment = Payment(
-        visit_id=data.visit_id,
-        patient_id=data.patient_id,
-        amount=data.amount,
-        method=data.method,
-        date=data.date,
-        payment_type=data.payment_type,
-    )
-    db.add(payment)
+    body = jsonable_encoder(PaymentRead.model_validate(payment))
+    body = await idempotency_store.commit_with_key(db, scope, idempotency_key, payload_hash, body)
+    dashboard_cache.bump("payment", "visit")
+    return body
 
-    # обновляем суммы по визиту
-    new_paid = visit.paid_amount + data.amount
-    visit.paid_amount = new_paid
-    visit.remaining = max(0.0, visit.total_amount - new_paid)
 
-    if visit.remaining == 0:
-        visit.payment_status = PaymentStatus.paid
-    elif visit.remaining < visit.total_amount:
-        visit.payment_status = PaymentStatus.partial
-    else:
-        visit.payment_status = PaymentStatus.unpaid
+@router.post("/import", response_model=PaymentImportResult)
+async def import_payments_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(role_required(UserRole.manager)),
+):
+    """
+    Импорт платежей из выгрузки терминала/банка одной транзакцией.
+    Тело — JSON-массив PaymentCreate или CSV (Content-Type: text/csv)
+    с заголовком visit_id,patient_id,amount,method,date,payment_type.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            raw = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+        else:
+            raw = json.loads(body)
+        items = _payment_list.validate_python(raw)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False))
+    except (ValueError, csv.Error):
+        raise HTTPException(400, "Не удалось разобрать файл платежей")
 
-    # обновляем долг пациента (простая модель: сумма remaining по всем визитам)
-    result = await db.execute(
-        select(func.coalesce(func.sum(Visit.remaining), 0.0)).where(Visit.patient_id == patient.id)
-    )
-    total_debt = float(result.scalar() or 0.0)
-    patient.total_debt = total_debt
-    patient.has_debt = total_debt > 0
+    if not items:
+        raise HTTPException(400, "Пустой список платежей")
+    if len(items) > MAX_IMPORT_ROWS:
+        raise HTTPException(400, f"Не больше {MAX_IMPORT_ROWS} платежей за раз")
 
+    result = await import_payments(db, items)
     await db.commit()
-    await db.refresh(payment)
-    return payment
+    dashboard_cache.bump("payment", "visit")
+    return result
+
 
+# колонки сразу названы как поля ManagerPaymentItem
+_MANAGER_PAYMENT_COLUMNS = (
+    Payment.id,
+    Payment.visit_id.label("visitId"),
+    Visit.procedure,
+    Visit.date.label("visitDate"),
+    Visit.total_amount.label("total"),
+    Visit.paid_amount.label("alreadyPaid"),
+    Visit.remaining.label("remaining"),
+    Payment.amount.label("paymentAmount"),
+    Payment.method,
+    Visit.remaining.label("newRemaining"),  # на момент запроса
+    Payment.date.label("payment_date"),  # для курсора
+)
+
+
+def _manager_payments_stmt(*, date_from: Optional[date], date_to: Optional[date], cursor: Optional[str]):
+    """Платежи с данными визита (payment JOIN visit) за период, без сортировки."""
+    j = join(Payment, Visit, Payment.visit_id == Visit.id)
+    stmt = select(*_MANAGER_PAYMENT_COLUMNS).select_from(j)
 
-@router.get("/manager", response_model=List[ManagerPaymentItem])
+    conditions = _page_conditions(date_from=date_from, date_to=date_to, cursor=cursor)
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    return stmt
+
+
+def _manager_payment_page_stmt(
+    *,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    cursor: Optional[str],
+    limit: int,
+):
+    stmt = _manager_payments_stmt(date_from=date_from, date_to=date_to, cursor=cursor)
+    return stmt.order_by(Payment.date.desc(), Payment.id.desc()).limit(limit + 1)
+
+
+def _manager_payment_export_stmt(*, date_from: Optional[date], date_to: Optional[date]):
+    stmt = _manager_payments_stmt(date_from=date_from, date_to=date_to, cursor=None)
+    return stmt.order_by(Payment.date, Payment.id)
+
+
+@router.get("/manager", response_model=ManagerPaymentPage)
 async def list_manager_payments(
     db: AsyncSession = Depends(get_db),
     current_user=Depends(role_required(UserRole.manager)),
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
 ):
     """
-    Список платежей для менеджера в виде ManagerPaymentModel.
+    Список платежей для менеджера в виде ManagerPaymentModel,
+    постранично по ключу (date, id): следующую страницу — с cursor=nextCursor.
     """
-    j = join(Payment, Visit, Payment.visit_id == Visit.id)
-    stmt = select(
-        Payment.id,
-        Payment.visit_id,
-        Visit.procedure,
-        Visit.date.label("visit_date"),
-        Visit.total_amount.label("total"),
-        Visit.paid_amount.label("already_paid"),
-        Visit.remaining.label("remaining"),
-        Payment.amount.label("payment_amount"),
-        Payment.method,
-        Visit.remaining.label("new_remaining"),  # на момент запроса
-    ).select_from(j)
-
-    conditions = []
-    if date_from:
-        conditions.append(Payment.date >= datetime.combine(date_from, datetime.min.time()))
-    if date_to:
-        conditions.append(Payment.date <= datetime.combine(date_to, datetime.max.time()))
-    if conditions:
-        stmt = stmt.where(and_(*conditions))
-
-    stmt = stmt.order_by(Payment.date.desc())
-
+    stmt = _manager_payment_page_stmt(
+        date_from=date_from, date_to=date_to, cursor=cursor, limit=limit
+    )
     result = await db.execute(stmt)
     rows = result.all()
 
-    items: List[ManagerPaymentItem] = []
-    for row in rows:
-        items.append(
-            ManagerPaymentItem(
-                id=row.id,
-                visitId=row.visit_id,
-                procedure=row.procedure,
-                visitDate=row.visit_date,
-                total=row.total,
-                alreadyPaid=row.already_paid,
-                remaining=row.remaining,
-                paymentAmount=row.payment_amount,
-                method=row.method.value if hasattr(row.method, "value") else row.method,
-                newRemaining=row.new_remaining,
-            )
-        )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].payment_date, rows[-1].id)
+
+    return ManagerPaymentPage(items=[row._mapping for row in rows], nextCursor=next_cursor)
+
 
-    return items
+@router.get("/manager/export")
+async def export_manager_payments(
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(role_required(UserRole.manager)),
+    fmt: ExportFormat = Query(ExportFormat.csv, alias="format"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+):
+    """
+    Выгрузка платежей с данными визита (как в /payments/manager) для бухгалтерии,
+    в CSV или NDJSON, за любой период: строки читаются с серверного курсора
+    и сразу пишутся в ответ, без сборки списка ManagerPaymentItem.
+    """
+    stmt = _manager_payment_export_stmt(date_from=date_from, date_to=date_to)
+    return await export_response(db, stmt, fmt, "payments")
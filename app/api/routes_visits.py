@@ -1,30 +1,49 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, and_
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, insert, func, and_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
 from app.core.deps import get_current_user, role_required
 from app.models.user import UserRole, User
 from app.models.patient import Patient
-from app.models.visit import Visit, VisitStatus, PaymentStatus
-from app.models.procedure import Procedure
+from app.models.visit import MAX_VISIT_DURATION_MIN, Visit, VisitStatus, PaymentStatus
+from app.core.config import get_settings
+from app.core.etag import is_not_modified, not_modified, weak_etag
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.services.procedure_catalog import procedure_catalog
+from app.services.schedule import BusyIntervals
+from app.services.export import ExportFormat, export_response
+from app.services.ledger import apply_debt_delta, payment_status_for
+from app.services.revenue import refresh_daily_finance
+from app.services.idempotency import idempotency_store, request_hash
+from app.services.dashboard_cache import dashboard_cache
 
 from app.schemas.visit import (
     VisitCreate,
+    VisitBulkCreate,
     VisitRead,
+    VisitPage,
     VisitCreateByDentist,
     VisitCompleteByDentist,
+    DentistAvailability,
+    FreeSlot,
 )
 
 router = APIRouter(prefix="/visits", tags=["visits"])
+settings = get_settings()
 
 DEFAULT_VISIT_DURATION_MIN = 30
 
+# пространство ключей pg_advisory_xact_lock(namespace, dentist_id) для расписания
+SCHEDULE_LOCK_NAMESPACE = 1
+
 
 # -----------------------------
 # Helpers
@@ -40,18 +59,62 @@ async def _get_duration_minutes(
     1) если duration_minutes передали — используем
     2) иначе если есть procedure_id и у процедуры есть duration_minutes — используем
     3) иначе DEFAULT_VISIT_DURATION_MIN
+
+    Длительность из справочника обрезается до MAX_VISIT_DURATION_MIN
+    (явную ограничивают схемы запросов).
+
+    Процедура берётся из справочника в памяти, без запроса в БД.
     """
     if duration_minutes and duration_minutes > 0:
         return int(duration_minutes)
 
     if procedure_id:
-        proc = await db.get(Procedure, procedure_id)
+        proc = await procedure_catalog.get(db, procedure_id)
         if proc and proc.duration_minutes and proc.duration_minutes > 0:
-            return int(proc.duration_minutes)
+            return min(int(proc.duration_minutes), MAX_VISIT_DURATION_MIN)
 
     return DEFAULT_VISIT_DURATION_MIN
 
 
+async def _lock_dentist_schedule(db: AsyncSession, dentist_id: int) -> None:
+    """
+    Блокировка расписания одного врача до конца транзакции.
+    Два одновременных бронирования к одному врачу выполняют
+    проверку пересечений и вставку по очереди, к разным врачам — параллельно.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(SCHEDULE_LOCK_NAMESPACE, dentist_id)))
+
+
+def _dentist_window_stmt(dentist_id: int, start_dt: datetime, end_dt: datetime):
+    """
+    Визиты врача, пересекающие [start_dt, end_dt): start_dt < existing_end
+    AND end_dt > existing_start. existing_end хранится в Visit.end_date, поэтому
+    это один запрос. Визит не длиннее MAX_VISIT_DURATION_MIN, значит пересекающийся
+    начался не раньше start_dt - MAX_VISIT_DURATION_MIN: диапазон по (dentist_id, date)
+    ограничен окном вокруг нового визита, а не всеми будущими визитами врача.
+    """
+    return select(Visit.id, Visit.date, Visit.end_date).where(
+        and_(
+            Visit.dentist_id == dentist_id,
+            Visit.date > start_dt - timedelta(minutes=MAX_VISIT_DURATION_MIN),
+            Visit.date < end_dt,
+            Visit.end_date > start_dt,
+        )
+    )
+
+
+def _overlap_stmt(
+    dentist_id: int,
+    start_dt: datetime,
+    end_dt: datetime,
+    exclude_visit_id: Optional[int] = None,
+):
+    stmt = _dentist_window_stmt(dentist_id, start_dt, end_dt).order_by(Visit.date).limit(1)
+    if exclude_visit_id:
+        stmt = stmt.where(Visit.id != exclude_visit_id)
+    return stmt
+
+
 async def _check_overlap(
     db: AsyncSession,
     *,
@@ -61,43 +124,101 @@ async def _check_overlap(
     exclude_visit_id: Optional[int] = None,
 ) -> None:
     """
-    Проверяем пересечение интервалов:
-    новый [start_dt, end_dt]
-    конфликт если start_dt < existing_end AND end_dt > existing_start
-
-    existing_end = existing.date + duration
-    duration берём:
-      - existing.duration_minutes
-      - иначе existing.procedure.duration_minutes
-      - иначе DEFAULT_VISIT_DURATION_MIN
+    Проверяем пересечение нового [start_dt, end_dt] с визитами врача
+    (_dentist_window_stmt); exclude_visit_id — сам изменяемый визит.
     """
-    stmt = select(Visit).where(Visit.dentist_id == dentist_id)
-    if exclude_visit_id:
-        stmt = stmt.where(Visit.id != exclude_visit_id)
+    res = await db.execute(_overlap_stmt(dentist_id, start_dt, end_dt, exclude_visit_id))
+    conflict = res.first()
 
-    res = await db.execute(stmt)
-    visits = res.scalars().all()
-
-    for v in visits:
-        existing_duration = await _get_duration_minutes(
-            db,
-            duration_minutes=v.duration_minutes,
-            procedure_id=v.procedure_id,
+    if conflict:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Пересечение расписания: есть визит {conflict.id} с {conflict.date} до {conflict.end_date}",
         )
-        v_start = v.date
-        v_end = v.date + timedelta(minutes=existing_duration)
 
-        if start_dt < v_end and end_dt > v_start:
-            raise HTTPException(
-                status_code=409,
-                detail=f"Пересечение расписания: есть визит {v.id} с {v_start} до {v_end}",
-            )
+
+# колонки VisitRead: списки и выгрузка читают только их, без ORM-объектов
+_VISIT_READ_COLUMNS = (
+    Visit.id,
+    Visit.patient_id,
+    Visit.dentist_id,
+    Visit.procedure_id,
+    Visit.procedure,
+    Visit.duration_minutes,
+    Visit.date,
+    Visit.total_amount,
+    Visit.paid_amount,
+    Visit.remaining,
+    Visit.payment_status,
+    Visit.visit_status,
+)
+
+
+def _visit_conditions(
+    *,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    dentist_id: Optional[int],
+    patient_id: Optional[int],
+    visit_status: Optional[VisitStatus],
+) -> list:
+    conditions = []
+    if date_from:
+        conditions.append(Visit.date >= date_from)
+    if date_to:
+        conditions.append(Visit.date <= date_to)
+    if dentist_id:
+        conditions.append(Visit.dentist_id == dentist_id)
+    if patient_id:
+        conditions.append(Visit.patient_id == patient_id)
+    if visit_status:
+        conditions.append(Visit.visit_status == visit_status)
+    return conditions
+
+
+def _visit_page_stmt(*, cursor: Optional[str], limit: int, **filters):
+    """Страница списка визитов: новые сверху, keyset по (date, id); на строку больше limit."""
+    conditions = _visit_conditions(**filters)
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, datetime, int)
+        conditions.append(tuple_(Visit.date, Visit.id) < tuple_(after_date, after_id))
+
+    stmt = select(*_VISIT_READ_COLUMNS)
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    return stmt.order_by(Visit.date.desc(), Visit.id.desc()).limit(limit + 1)
+
+
+def _visit_export_stmt(**filters):
+    stmt = select(*_VISIT_READ_COLUMNS)
+    conditions = _visit_conditions(**filters)
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    return stmt.order_by(Visit.date, Visit.id)
+
+
+def _busy_intervals_stmt(range_start: datetime, range_end: datetime, dentist_id: Optional[int]):
+    """
+    Визиты, задевающие [range_start, range_end). Визит не длиннее
+    MAX_VISIT_DURATION_MIN, поэтому у диапазона по date есть нижняя граница,
+    и без dentist_id читается только период из ix_visit_date_id.
+    """
+    stmt = select(Visit.dentist_id, Visit.date, Visit.end_date).where(
+        and_(
+            Visit.date >= range_start - timedelta(minutes=MAX_VISIT_DURATION_MIN),
+            Visit.date < range_end,
+            Visit.end_date > range_start,
+        )
+    )
+    if dentist_id:
+        stmt = stmt.where(Visit.dentist_id == dentist_id)
+    return stmt
 
 
 # -----------------------------
 # Public endpoints
 # -----------------------------
-@router.get("/", response_model=List[VisitRead])
+@router.get("/", response_model=VisitPage)
 async def list_visits(
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -106,45 +227,146 @@ async def list_visits(
     dentist_id: Optional[int] = Query(None),
     patient_id: Optional[int] = Query(None),
     visit_status: Optional[VisitStatus] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
 ):
     """
-    Список визитов с фильтрами.
+    Список визитов с фильтрами, постранично (новые сверху).
+    Пагинация по ключу (date, id): следующую страницу запрашивать
+    с cursor=next_cursor из ответа, поэтому глубокие страницы
+    стоят столько же, сколько первая.
+    Читаются только колонки ответа (Row), без ORM-объектов.
     """
-    stmt = select(Visit)
-    conditions = []
+    stmt = _visit_page_stmt(
+        date_from=date_from,
+        date_to=date_to,
+        dentist_id=dentist_id,
+        patient_id=patient_id,
+        visit_status=visit_status,
+        cursor=cursor,
+        limit=limit,
+    )
+    result = await db.execute(stmt)
+    rows = result.all()
 
-    if date_from:
-        conditions.append(Visit.date >= date_from)
-    if date_to:
-        conditions.append(Visit.date <= date_to)
-    if dentist_id:
-        conditions.append(Visit.dentist_id == dentist_id)
-    if patient_id:
-        conditions.append(Visit.patient_id == patient_id)
-    if visit_status:
-        conditions.append(Visit.visit_status == visit_status)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
 
-    if conditions:
-        stmt = stmt.where(and_(*conditions))
+    return VisitPage(items=rows, next_cursor=next_cursor)
 
-    stmt = stmt.order_by(Visit.date.desc())
-    result = await db.execute(stmt)
-    return result.scalars().all()
+
+@router.get("/export")
+async def export_visits(
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    fmt: ExportFormat = Query(ExportFormat.csv, alias="format"),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    dentist_id: Optional[int] = Query(None),
+    patient_id: Optional[int] = Query(None),
+    visit_status: Optional[VisitStatus] = Query(None),
+):
+    """
+    Выгрузка визитов (для сверки бухгалтерией) в CSV или NDJSON.
+    Строки читаются с серверного курсора и сразу пишутся в ответ.
+    """
+    stmt = _visit_export_stmt(
+        date_from=date_from,
+        date_to=date_to,
+        dentist_id=dentist_id,
+        patient_id=patient_id,
+        visit_status=visit_status,
+    )
+    return await export_response(db, stmt, fmt, "visits")
+
+
+@router.get("/availability", response_model=List[DentistAvailability])
+async def get_availability(
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    dentist_id: Optional[int] = Query(None),
+    date_value: Optional[date] = Query(None, alias="date"),
+    days: int = Query(1, ge=1, le=7),
+    duration: int = Query(DEFAULT_VISIT_DURATION_MIN, gt=0, le=MAX_VISIT_DURATION_MIN),
+):
+    """
+    Свободные окна в рабочие часы (work_day_start_hour..work_day_end_hour),
+    в которые помещается визит длиной duration минут.
+    - dentist_id не указан — по всем активным стоматологам
+    - days — сколько дней начиная с date (до недели)
+
+    Все визиты периода читаются одним запросом по диапазону дат,
+    дальше окна считаются по отсортированным интервалам каждого врача.
+    """
+    if not date_value:
+        date_value = datetime.utcnow().date()
+
+    dentists_stmt = select(User.id).where(
+        and_(User.role == UserRole.dentist, User.is_active.is_(True))
+    )
+    if dentist_id:
+        dentists_stmt = dentists_stmt.where(User.id == dentist_id)
+    dentist_ids = (await db.execute(dentists_stmt.order_by(User.id))).scalars().all()
+    if dentist_id and not dentist_ids:
+        raise HTTPException(404, "Стоматолог не найден")
+
+    range_start = datetime.combine(date_value, datetime.min.time())
+    range_end = range_start + timedelta(days=days)
+
+    busy = defaultdict(list)
+    for row in await db.execute(_busy_intervals_stmt(range_start, range_end, dentist_id)):
+        busy[row.dentist_id].append((row.date, row.end_date))
+
+    min_duration = timedelta(minutes=duration)
+    items: List[DentistAvailability] = []
+    for d_id in dentist_ids:
+        intervals = BusyIntervals(busy.get(d_id, ()))
+        for offset in range(days):
+            day = date_value + timedelta(days=offset)
+            day_start = datetime.combine(day, datetime.min.time())
+            windows = intervals.free_windows(
+                day_start + timedelta(hours=settings.work_day_start_hour),
+                day_start + timedelta(hours=settings.work_day_end_hour),
+                min_duration,
+            )
+            items.append(
+                DentistAvailability(
+                    dentist_id=d_id,
+                    day=day,
+                    slots=[FreeSlot(start=start, end=end) for start, end in windows],
+                )
+            )
+
+    return items
 
 
 @router.get("/{visit_id}", response_model=VisitRead)
 async def get_visit(
     visit_id: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
     Получить визит по id.
+    Отдаёт ETag по updated_at; при совпадении If-None-Match — 304 без тела.
     """
-    visit = await db.get(Visit, visit_id)
-    if not visit:
+    result = await db.execute(
+        select(*_VISIT_READ_COLUMNS, Visit.updated_at).where(Visit.id == visit_id)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(404, "Визит не найден")
-    return visit
+
+    etag = weak_etag("visit", row.id, row.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    return row
 
 
 # -----------------------------
@@ -155,9 +377,11 @@ async def create_visit_by_manager(
     data: VisitCreate,
     db: AsyncSession = Depends(get_db),
     manager=Depends(role_required(UserRole.manager)),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
     Создание визита менеджером (может выбрать любого стоматолога).
+    Повтор с тем же Idempotency-Key возвращает сохранённый ответ.
     """
     patient = await db.get(Patient, data.patient_id)
     if not patient:
@@ -175,6 +399,16 @@ async def create_visit_by_manager(
     start_dt = data.date
     end_dt = data.date + timedelta(minutes=duration)
 
+    # ключ проверяем под блокировкой расписания: параллельный повтор дождётся
+    # первого запроса и получит его ответ, а не 409 на свой же визит
+    await _lock_dentist_schedule(db, data.dentist_id)
+    scope = f"visits:create:{manager.id}"
+    payload_hash = request_hash(data)
+    stored = await idempotency_store.lookup(db, scope, idempotency_key, payload_hash)
+    if stored is not None:
+        await db.rollback()
+        return stored
+
     await _check_overlap(db, dentist_id=data.dentist_id, start_dt=start_dt, end_dt=end_dt)
 
     # Важно: по твоему ТЗ сумма может быть сначала null/0 и ставится после осмотра.
@@ -199,6 +433,7 @@ async def create_visit_by_manager(
         procedure=getattr(data, "procedure", None),
         duration_minutes=getattr(data, "duration_minutes", None),
         date=data.date,
+        end_date=end_dt,
         total_amount=total_amount,
         paid_amount=paid_amount,
         remaining=remaining,
@@ -207,9 +442,85 @@ async def create_visit_by_manager(
     )
 
     db.add(visit)
+    await apply_debt_delta(db, data.patient_id, remaining)
+    await db.flush()
+
+    body = jsonable_encoder(VisitRead.model_validate(visit))
+    body = await idempotency_store.commit_with_key(db, scope, idempotency_key, payload_hash, body)
+    dashboard_cache.bump("visit")
+    return body
+
+
+# -----------------------------
+# Manager books a series of visits (treatment plan)
+# -----------------------------
+@router.post("/bulk", response_model=List[VisitRead])
+async def create_visits_bulk(
+    data: VisitBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    manager=Depends(role_required(UserRole.manager)),
+):
+    """
+    Пакетная запись по плану лечения: список дат или правило повторения.
+    - все интервалы проверяются за один проход: против расписания врача
+      (один запрос на весь период) и друг против друга
+    - при любом пересечении — 409, ничего не создаётся
+    - вставка одним многострочным INSERT в одной транзакции
+    """
+    patient = await db.get(Patient, data.patient_id)
+    if not patient:
+        raise HTTPException(404, "Пациент не найден")
+
+    dentist = await db.get(User, data.dentist_id)
+    if not dentist or dentist.role != UserRole.dentist:
+        raise HTTPException(400, "Стоматолог не найден или роль некорректна")
+
+    duration = await _get_duration_minutes(
+        db,
+        duration_minutes=data.duration_minutes,
+        procedure_id=data.procedure_id,
+    )
+    candidates = sorted(
+        (start, start + timedelta(minutes=duration)) for start in data.start_dates()
+    )
+
+    await _lock_dentist_schedule(db, data.dentist_id)
+    res = await db.execute(
+        _dentist_window_stmt(data.dentist_id, candidates[0][0], candidates[-1][1])
+    )
+    existing = BusyIntervals((row.date, row.end_date) for row in res)
+    batch = BusyIntervals()
+
+    for start_dt, end_dt in candidates:
+        if not existing.is_free(start_dt, end_dt):
+            raise HTTPException(409, f"Пересечение расписания: {start_dt} — {end_dt} уже занято")
+        if not batch.is_free(start_dt, end_dt):
+            raise HTTPException(409, f"Визиты пакета пересекаются между собой: {start_dt}")
+        batch.add(start_dt, end_dt)
+
+    rows = [
+        dict(
+            patient_id=data.patient_id,
+            dentist_id=data.dentist_id,
+            procedure_id=data.procedure_id,
+            procedure=data.procedure,
+            duration_minutes=data.duration_minutes,
+            date=start_dt,
+            end_date=end_dt,
+            total_amount=None,
+            paid_amount=0.0,
+            remaining=0.0,
+            payment_status=PaymentStatus.unpaid,
+            visit_status=VisitStatus.scheduled,
+        )
+        for start_dt, end_dt in candidates
+    ]
+    result = await db.scalars(insert(Visit).returning(Visit), rows)
+    visits = result.all()
+
     await db.commit()
-    await db.refresh(visit)
-    return visit
+    dashboard_cache.bump("visit")
+    return visits
 
 
 # -----------------------------
@@ -220,10 +531,12 @@ async def create_visit_by_dentist(
     data: VisitCreateByDentist,
     db: AsyncSession = Depends(get_db),
     dentist=Depends(role_required(UserRole.dentist)),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
     Стоматолог создаёт визит ТОЛЬКО себе.
     Дата может быть в прошлом (по твоему ТЗ — да).
+    Повтор с тем же Idempotency-Key возвращает сохранённый ответ.
     """
     patient = await db.get(Patient, data.patient_id)
     if not patient:
@@ -237,6 +550,14 @@ async def create_visit_by_dentist(
     start_dt = data.date
     end_dt = data.date + timedelta(minutes=duration)
 
+    await _lock_dentist_schedule(db, dentist.id)
+    scope = f"visits:create_dentist:{dentist.id}"
+    payload_hash = request_hash(data)
+    stored = await idempotency_store.lookup(db, scope, idempotency_key, payload_hash)
+    if stored is not None:
+        await db.rollback()
+        return stored
+
     await _check_overlap(db, dentist_id=dentist.id, start_dt=start_dt, end_dt=end_dt)
 
     # Важно: стоматолог создаёт визит без суммы (после осмотра)
@@ -247,6 +568,7 @@ async def create_visit_by_dentist(
         procedure=data.procedure,
         duration_minutes=data.duration_minutes,
         date=data.date,
+        end_date=end_dt,
         total_amount=None,      # сначала NULL
         paid_amount=0.0,
         remaining=0.0,
@@ -255,9 +577,12 @@ async def create_visit_by_dentist(
     )
 
     db.add(visit)
-    await db.commit()
-    await db.refresh(visit)
-    return visit
+    await db.flush()
+
+    body = jsonable_encoder(VisitRead.model_validate(visit))
+    body = await idempotency_store.commit_with_key(db, scope, idempotency_key, payload_hash, body)
+    dashboard_cache.bump("visit")
+    return body
 
 
 # -----------------------------
@@ -277,8 +602,20 @@ async def complete_visit_by_dentist(
     - может обновить duration_minutes
     - меняет visit_status -> completed
     - payment_status пересчитывается автоматически (оплата всё равно делает менеджер)
+
+    Строка визита читается под блокировкой (как в apply_payment): иначе
+    параллельный платёж успевает изменить paid_amount между чтением и записью,
+    и remaining / долг пациента считаются от устаревшей суммы.
+
+    Новая длительность проверяется на пересечения под блокировкой расписания
+    врача, как при бронировании: визит не может наехать на следующие.
     """
-    visit = await db.get(Visit, visit_id)
+    visit = await db.get(
+        Visit,
+        visit_id,
+        with_for_update={"key_share": True},
+        populate_existing=True,
+    )
     if not visit:
         raise HTTPException(404, "Визит не найден")
 
@@ -289,7 +626,18 @@ async def complete_visit_by_dentist(
     if data.duration_minutes is not None:
         if data.duration_minutes <= 0:
             raise HTTPException(400, "duration_minutes должен быть > 0")
+        new_end = visit.date + timedelta(minutes=int(data.duration_minutes))
+        if new_end != visit.end_date:
+            await _lock_dentist_schedule(db, visit.dentist_id)
+            await _check_overlap(
+                db,
+                dentist_id=visit.dentist_id,
+                start_dt=visit.date,
+                end_dt=new_end,
+                exclude_visit_id=visit.id,
+            )
         visit.duration_minutes = int(data.duration_minutes)
+        visit.end_date = new_end
 
     # ставим сумму после осмотра
     if data.total_amount < 0:
@@ -297,23 +645,25 @@ async def complete_visit_by_dentist(
 
     visit.total_amount = float(data.total_amount)
 
-    # пересчитываем remaining
+    # пересчитываем remaining (и долг пациента на разницу)
+    old_remaining = float(visit.remaining or 0.0)
     paid = float(visit.paid_amount or 0.0)
     total = float(visit.total_amount or 0.0)
     visit.remaining = max(0.0, total - paid)
+    await apply_debt_delta(db, visit.patient_id, visit.remaining - old_remaining)
 
     # статус визита
     visit.visit_status = VisitStatus.completed
 
     # статус оплаты (оплаты делает менеджер, но статус должен быть честный)
-    if visit.remaining == 0 and total > 0:
-        visit.payment_status = PaymentStatus.paid
-    elif 0 < visit.remaining < total:
-        visit.payment_status = PaymentStatus.partial
-    else:
-        visit.payment_status = PaymentStatus.unpaid
+    visit.payment_status = payment_status_for(visit.remaining, total, paid)
+
+    # новый остаток входит в долг дней, когда по визиту платили
+    await db.flush()
+    await refresh_daily_finance(db, [visit.id])
 
     await db.commit()
+    dashboard_cache.bump("visit")
     await db.refresh(visit)
     return visit
 
@@ -343,5 +693,6 @@ async def update_visit_status(
 
     visit.visit_status = visit_status
     await db.commit()
+    dashboard_cache.bump("visit")
     await db.refresh(visit)
     return visit
@@ -0,0 +1,63 @@
+"""
+Служебные команды:
+
+    python -m app.cli backfill-revenue   # пересобрать daily_revenue из payment
+    python -m app.cli backfill-finance   # пересобрать daily_finance из payment и visit
+    python -m app.cli reconcile          # пересчитать оплаты визитов и долги пациентов из payment
+"""
+import argparse
+import asyncio
+
+from app.db.session import AsyncSessionLocal, engine
+from app.services.ledger import reconcile_ledger
+from app.services.revenue import backfill_daily_finance, backfill_daily_revenue
+
+
+async def _backfill_revenue() -> None:
+    async with AsyncSessionLocal() as session:
+        rows = await backfill_daily_revenue(session)
+        await session.commit()
+    print(f"daily_revenue: {rows} rows")
+
+
+async def _backfill_finance() -> None:
+    async with AsyncSessionLocal() as session:
+        rows = await backfill_daily_finance(session)
+        await session.commit()
+    print(f"daily_finance: {rows} rows")
+
+
+async def _reconcile() -> None:
+    async with AsyncSessionLocal() as session:
+        await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        fixed = await reconcile_ledger(session)
+        if fixed["visits"]:
+            # долг по дням считается от remaining визитов
+            await backfill_daily_finance(session)
+        await session.commit()
+    print(f"reconcile: fixed {fixed['visits']} visits, {fixed['patients']} patients")
+
+
+COMMANDS = {
+    "backfill-finance": _backfill_finance,
+    "backfill-revenue": _backfill_revenue,
+    "reconcile": _reconcile,
+}
+
+
+async def _run(command: str) -> None:
+    try:
+        await COMMANDS[command]()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(_run(args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,27 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_minutes: int = 60
 
+    # справочник процедур в памяти (см. app/services/procedure_catalog.py)
+    procedure_catalog_ttl_seconds: int = 300
+
+    # рабочие часы клиники (для поиска свободных окон)
+    work_day_start_hour: int = 9
+    work_day_end_hour: int = 20
+
+    # фоновая сверка Patient.total_debt с SUM(Visit.remaining); 0 — выключено
+    debt_verifier_interval_seconds: int = 3600
+
+    # Idempotency-Key для POST: сколько хранить ответы и размер LRU в памяти
+    idempotency_ttl_seconds: int = 86400
+    idempotency_cache_size: int = 10000
+
+    # сколько запросов одного дашборда идут параллельно (соединений из пула на запрос)
+    dashboard_query_concurrency: int = 4
+
+    # кэш ответов дашбордов: TTL (подстраховка для записей из других воркеров; 0 — выключен) и размер
+    dashboard_cache_ttl_seconds: int = 30
+    dashboard_cache_size: int = 1000
+
 
 @lru_cache
 def get_settings() -> Settings:
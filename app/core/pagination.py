@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, List
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values: Any) -> str:
+    """Непрозрачный курсор для keyset-пагинации: значения ключа сортировки последней строки."""
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> List[Any]:
+    """
+    Разобрать курсор из encode_cursor и привести значения к types
+    (datetime/date — из isoformat). Любой мусор -> 400.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [
+            t.fromisoformat(v) if t in (date, datetime) else t(v)
+            for t, v in zip(types, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(400, "Некорректный cursor")
@@ -7,3 +7,6 @@ from app.models.visit import Visit
 from app.models.payment import Payment
 from app.models.clinic import Clinic
 from app.models.procedure import Procedure
+from app.models.idempotency import IdempotencyKey
+from app.models.daily_revenue import DailyRevenue
+from app.models.daily_finance import DailyFinance
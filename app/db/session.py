@@ -1,3 +1,6 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from app.core.config import get_settings
 
@@ -19,3 +22,34 @@ AsyncSessionLocal = async_sessionmaker(
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def fan_out(
+    db: AsyncSession,
+    *queries: Callable[[AsyncSession], Awaitable[Any]],
+    limit: int = settings.dashboard_query_concurrency,
+) -> List[Any]:
+    """
+    Выполнить независимые read-only запросы параллельно, каждый на своей
+    сессии (своём соединении из пула), не больше limit одновременно.
+    Результаты — в порядке queries.
+
+    db — сессия запроса (через неё уже прошла авторизация): её транзакция
+    завершается до fan-out, и соединение возвращается в пул. Иначе каждый
+    запрос держал бы 1 + limit соединений, и при нагрузке пул целиком
+    заняли бы запросы, ждущие друг друга. Объекты сессии не истекают
+    (expire_on_commit=False).
+
+    Каждый запрос видит свой снимок БД, поэтому подходит только для
+    независимых агрегатов (дашборды), а не для согласованного чтения.
+    """
+    await db.commit()
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(query: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            async with AsyncSessionLocal() as session:
+                return await query(session)
+
+    return list(await asyncio.gather(*(run(query) for query in queries)))
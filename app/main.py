@@ -1,12 +1,33 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
 from app.api import routes_auth, routes_patients, routes_dashboard, routes_visits, routes_payments
+from app.services.ledger import run_debt_verifier
+from app.services.idempotency import run_idempotency_purge
 
 settings = get_settings()
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # фоновые задачи на время жизни приложения
+    tasks = []
+    if settings.debt_verifier_interval_seconds > 0:
+        tasks.append(asyncio.create_task(run_debt_verifier(settings.debt_verifier_interval_seconds)))
+    tasks.append(asyncio.create_task(run_idempotency_purge(3600)))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 # CORS (нужно для Flutter Web и для любых запросов из браузера)
 allow_origins = [
@@ -3,3 +3,6 @@ from . import patient  # noqa
 from . import visit  # noqa
 from . import payment  # noqa
 from . import clinic  # noqa
+from . import idempotency  # noqa
+from . import daily_revenue  # noqa
+from . import daily_finance  # noqa
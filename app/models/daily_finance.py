@@ -0,0 +1,23 @@
+from datetime import date
+
+from sqlalchemy import Date, Float, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class DailyFinance(Base):
+    """
+    Финансы по дням для /dashboard/admin/finance: выручка за день, текущий
+    остаток по визитам, оплаченным в этот день, число разных визитов и пациентов.
+    Дни пересчитываются в транзакции записи (см. app/services/revenue.py).
+    """
+
+    __tablename__ = "daily_finance"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    income: Mapped[float] = mapped_column(Float, default=0.0)
+    debt: Mapped[float] = mapped_column(Float, default=0.0)
+    visits_count: Mapped[int] = mapped_column(Integer, default=0)
+    patients_count: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,23 @@
+from datetime import date
+
+from sqlalchemy import Date, Enum, Float, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+from app.models.payment import PaymentMethod
+
+
+class DailyRevenue(Base):
+    """
+    Выручка по дням: сумма и количество платежей за день по врачу и способу оплаты.
+    Обновляется в той же транзакции, что и вставка платежа (см. app/services/revenue.py).
+    """
+
+    __tablename__ = "daily_revenue"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    dentist_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True)
+    method: Mapped[PaymentMethod] = mapped_column(Enum(PaymentMethod), primary_key=True)
+
+    amount: Mapped[float] = mapped_column(Float, default=0.0)
+    count: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,13 +1,18 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, DateTime, Float, Boolean
+from sqlalchemy import String, DateTime, Float, Boolean, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base_class import Base
 
 
 class Patient(Base):
+    __table_args__ = (
+        # список должников: WHERE has_debt ORDER BY total_debt DESC, id DESC + keyset
+        Index("ix_patient_debtors", "total_debt", "id", postgresql_where=text("has_debt")),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     full_name: Mapped[str] = mapped_column(String(255))
     phone: Mapped[str] = mapped_column(String(20), index=True)
@@ -18,3 +23,10 @@ class Patient(Base):
     last_visit_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     has_debt: Mapped[bool] = mapped_column(Boolean, default=False)
+
+    # версия строки для ETag / conditional GET
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -1,6 +1,6 @@
 import enum
 from datetime import datetime
-from sqlalchemy import String, DateTime, Float, ForeignKey, Enum
+from sqlalchemy import String, DateTime, Float, ForeignKey, Enum, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base_class import Base
 
@@ -17,6 +17,15 @@ class PaymentType(str, enum.Enum):
 
 
 class Payment(Base):
+    __table_args__ = (
+        # суммы выручки за период (index-only scan) и списки платежей:
+        # ORDER BY date DESC, id DESC + keyset по (date, id)
+        Index("ix_payment_date_id", "date", "id", postgresql_include=["amount"]),
+        # выручка врача: join payment -> visit и фильтр по дате платежа
+        Index("ix_payment_visit_id", "visit_id", postgresql_include=["date", "amount"]),
+        Index("ix_payment_patient_id", "patient_id"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     visit_id: Mapped[int] = mapped_column(ForeignKey("visit.id"))
     patient_id: Mapped[int] = mapped_column(ForeignKey("patient.id"))
@@ -27,5 +36,12 @@ class Payment(Base):
 
     payment_type: Mapped[PaymentType] = mapped_column(Enum(PaymentType))
 
+    # версия строки для ETag / conditional GET
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
     visit = relationship("Visit", backref="payments")
     patient = relationship("Patient", backref="payments")
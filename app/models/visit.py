@@ -1,7 +1,18 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Enum
+from sqlalchemy import (
+    CheckConstraint,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base_class import Base
@@ -19,13 +30,37 @@ class VisitStatus(str, enum.Enum):
     completed = "завершён"
 
 
+# максимальная длительность визита: end_date - date не больше (CHECK в БД),
+# поэтому поиск визитов, задевающих период, ограничен снизу по date
+MAX_VISIT_DURATION_MIN = 8 * 60
+
+
 class Visit(Base):
     __tablename__ = "visit"
+    __table_args__ = (
+        CheckConstraint(
+            f"end_date <= date + interval '{MAX_VISIT_DURATION_MIN} minutes'",
+            name="ck_visit_max_duration",
+        ),
+        # проверка пересечений расписания: визиты врача, заканчивающиеся после начала нового
+        Index("ix_visit_dentist_id_end_date", "dentist_id", "end_date"),
+        # список визитов: ORDER BY date DESC, id DESC + keyset по (date, id)
+        Index("ix_visit_date_id", "date", "id"),
+        # расписание и дашборд врача: dentist_id = ? AND date в диапазоне
+        Index("ix_visit_dentist_id_date", "dentist_id", "date"),
+        # старение долга: только визиты с остатком, без чтения таблицы
+        Index(
+            "ix_visit_date_debt",
+            "date",
+            postgresql_where=text("remaining > 0"),
+            postgresql_include=["patient_id", "dentist_id", "remaining"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
     patient_id: Mapped[int] = mapped_column(ForeignKey("patient.id"), index=True)
-    dentist_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
+    dentist_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
 
     procedure_id: Mapped[int | None] = mapped_column(
         ForeignKey("procedure.id"),
@@ -39,7 +74,9 @@ class Visit(Base):
 
     duration_minutes: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
-    date: Mapped[datetime] = mapped_column(DateTime, index=True)
+    date: Mapped[datetime] = mapped_column(DateTime)
+    # date + длительность визита (хранится, чтобы искать пересечения одним запросом)
+    end_date: Mapped[datetime] = mapped_column(DateTime)
 
     total_amount: Mapped[float | None] = mapped_column(Float, nullable=True)
     paid_amount: Mapped[float] = mapped_column(Float, default=0.0)
@@ -53,3 +90,10 @@ class Visit(Base):
         Enum(VisitStatus, name="visit_status"),
         default=VisitStatus.scheduled,
     )
+
+    # версия строки для ETag / conditional GET
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -1,5 +1,7 @@
+import enum
+
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 
 # AdminDashboardModel
@@ -13,13 +15,22 @@ class AdminDashboard(BaseModel):
     percentChange: float
 
 
+class FinanceGranularity(str, enum.Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+
+
 class AdminFinanceItem(BaseModel):
-    date: datetime
+    date: datetime  # начало периода
     income: float
     paid: float
     debt: float
     visitsCount: int
     patientsCount: int
+    # заполнены только при разбивке by_dentist / by_method
+    dentistId: Optional[int] = None
+    method: Optional[str] = None
 
 
 class AdminStaffItem(BaseModel):
@@ -87,6 +98,34 @@ class ManagerPaymentItem(BaseModel):
     newRemaining: float
 
 
+class ManagerPaymentPage(BaseModel):
+    items: List[ManagerPaymentItem]
+    nextCursor: Optional[str] = None
+
+
+class DebtAgingBuckets(BaseModel):
+    days0to30: float
+    days31to60: float
+    days61to90: float
+    days90plus: float
+    total: float
+
+
+class DebtAgingPatientItem(DebtAgingBuckets):
+    patientId: int
+
+
+class DebtAgingDentistItem(DebtAgingBuckets):
+    dentistId: int
+
+
+class DebtAging(BaseModel):
+    asOf: date
+    total: DebtAgingBuckets
+    byPatient: List[DebtAgingPatientItem]
+    byDentist: List[DebtAgingDentistItem]
+
+
 class ManagerScheduleItem(BaseModel):
     date: datetime
     visits: list[VisitShort]
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr
 
@@ -24,3 +24,8 @@ class PatientRead(PatientBase):
 
     class Config:
         from_attributes = True  # для работы с SQLAlchemy моделями (ORM mode)
+
+
+class PatientPage(BaseModel):
+    items: List[PatientRead]
+    next_cursor: Optional[str] = None
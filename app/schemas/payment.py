@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
+from typing import List, Optional
 
 
 class PaymentMethod(str, Enum):
@@ -32,3 +33,14 @@ class PaymentRead(PaymentBase):
 
     class Config:
         from_attributes = True
+
+
+class PaymentPage(BaseModel):
+    items: List[PaymentRead]
+    next_cursor: Optional[str] = None
+
+
+class PaymentImportResult(BaseModel):
+    imported: int
+    visits: int
+    patients: int
@@ -1,9 +1,9 @@
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
-from app.models.visit import PaymentStatus, VisitStatus
+from app.models.visit import MAX_VISIT_DURATION_MIN, PaymentStatus, VisitStatus
 
 
 # -------- Dentist --------
@@ -12,12 +12,12 @@ class VisitCreateByDentist(BaseModel):
     procedure_id: Optional[int] = None
     procedure: Optional[str] = None
     date: datetime
-    duration_minutes: Optional[int] = None
+    duration_minutes: Optional[int] = Field(None, le=MAX_VISIT_DURATION_MIN)
 
 
 class VisitCompleteByDentist(BaseModel):
     total_amount: float = Field(..., ge=0)
-    duration_minutes: Optional[int] = Field(None, gt=0)
+    duration_minutes: Optional[int] = Field(None, gt=0, le=MAX_VISIT_DURATION_MIN)
 
 
 # -------- Manager --------
@@ -27,13 +27,47 @@ class VisitCreate(BaseModel):
     procedure_id: Optional[int] = None
     procedure: Optional[str] = None
     date: datetime
-    duration_minutes: Optional[int] = None
+    duration_minutes: Optional[int] = Field(None, le=MAX_VISIT_DURATION_MIN)
 
     # сумма по твоему ТЗ сначала может быть null,
     # поэтому менеджер может не указывать.
     total_amount: Optional[float] = Field(None, ge=0)
 
 
+# -------- Bulk (план лечения) --------
+MAX_BULK_VISITS = 100
+
+
+class VisitRecurrence(BaseModel):
+    start: datetime
+    interval_days: int = Field(7, gt=0, le=365)
+    count: int = Field(..., gt=0, le=MAX_BULK_VISITS)
+
+
+class VisitBulkCreate(BaseModel):
+    patient_id: int
+    dentist_id: int
+    procedure_id: Optional[int] = None
+    procedure: Optional[str] = None
+    duration_minutes: Optional[int] = Field(None, le=MAX_VISIT_DURATION_MIN)
+
+    # либо явный список дат, либо правило повторения
+    dates: Optional[List[datetime]] = Field(None, min_length=1, max_length=MAX_BULK_VISITS)
+    recurrence: Optional[VisitRecurrence] = None
+
+    @model_validator(mode="after")
+    def _dates_or_recurrence(self):
+        if (self.dates is None) == (self.recurrence is None):
+            raise ValueError("нужно указать либо dates, либо recurrence")
+        return self
+
+    def start_dates(self) -> List[datetime]:
+        if self.dates is not None:
+            return list(self.dates)
+        rec = self.recurrence
+        return [rec.start + timedelta(days=rec.interval_days * i) for i in range(rec.count)]
+
+
 # -------- Read --------
 class VisitRead(BaseModel):
     id: int
@@ -53,3 +87,20 @@ class VisitRead(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class VisitPage(BaseModel):
+    items: List[VisitRead]
+    next_cursor: Optional[str] = None
+
+
+# -------- Availability --------
+class FreeSlot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class DentistAvailability(BaseModel):
+    dentist_id: int
+    day: date
+    slots: List[FreeSlot]
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class DashboardCache:
+    """
+    Готовые ответы дашбордов в памяти процесса.
+
+    Ключ — (эндпоинт, роль, пользователь, параметры дат). Каждая запись
+    помнит поколения таблиц, из которых она посчитана; роуты записи
+    поднимают поколение своей таблицы (bump) после коммита, и все зависящие
+    от неё записи становятся промахом. Записи из других воркеров и CLI
+    счётчики этого процесса не видят — для них TTL dashboard_cache_ttl_seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int) -> None:
+        self._maxsize = maxsize
+        self._ttl_seconds = ttl_seconds
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._cache: "OrderedDict[Hashable, Tuple[float, Tuple[int, ...], Any]]" = OrderedDict()
+
+    def generation(self, tables: Sequence[str]) -> Tuple[int, ...]:
+        """
+        Текущие поколения таблиц. Снимать ДО расчёта ответа: запись,
+        закоммиченная во время расчёта, тогда не попадёт в кэш как свежая.
+        """
+        return tuple(self._generations[table] for table in tables)
+
+    def bump(self, *tables: str) -> None:
+        for table in tables:
+            self._generations[table] += 1
+
+    def get(self, key: Hashable, generation: Tuple[int, ...]) -> Optional[Any]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, stored_generation, value = entry
+        if expires_at < time.monotonic() or stored_generation != generation:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, generation: Tuple[int, ...], value: Any) -> Any:
+        if self._ttl_seconds <= 0:
+            return value
+        self._cache[key] = (time.monotonic() + self._ttl_seconds, generation, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+        return value
+
+
+dashboard_cache = DashboardCache(
+    maxsize=settings.dashboard_cache_size,
+    ttl_seconds=settings.dashboard_cache_ttl_seconds,
+)
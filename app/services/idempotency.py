@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.models.idempotency import IdempotencyKey
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def request_hash(payload: Any) -> str:
+    """Отпечаток тела запроса: ключ можно повторить только с тем же телом."""
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Сохранённые ответы POST по заголовку Idempotency-Key.
+
+    Быстрый путь — LRU в памяти процесса с TTL; таблица idempotency_key —
+    общая для всех воркеров и пишется в той же транзакции, что и сама
+    операция, поэтому ответ сохраняется тогда и только тогда, когда
+    закоммичена работа.
+
+    Ключ привязан к хешу тела запроса: повтор ключа с другим телом — 422,
+    а не чужой сохранённый ответ.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int) -> None:
+        self._maxsize = maxsize
+        self._ttl_seconds = ttl_seconds
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Optional[str], dict]]" = OrderedDict()
+
+    def _cache_get(self, cache_key: Tuple[str, str]) -> Optional[Tuple[Optional[str], dict]]:
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, stored_hash, body = entry
+        if expires_at < time.monotonic():
+            del self._cache[cache_key]
+            return None
+        self._cache.move_to_end(cache_key)
+        return stored_hash, body
+
+    def _cache_put(self, cache_key: Tuple[str, str], stored_hash: Optional[str], body: dict) -> None:
+        self._cache[cache_key] = (time.monotonic() + self._ttl_seconds, stored_hash, body)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _check_hash(stored_hash: Optional[str], payload_hash: str) -> None:
+        # у ключей, сохранённых до появления хеша, он NULL — с ними не сравниваем
+        if stored_hash is not None and stored_hash != payload_hash:
+            raise HTTPException(422, "Idempotency-Key уже использован с другим телом запроса")
+
+    async def lookup(
+        self,
+        db: AsyncSession,
+        scope: str,
+        key: Optional[str],
+        payload_hash: str,
+    ) -> Optional[dict]:
+        """
+        Сохранённый ответ на (scope, key) или None, если запрос новый.
+        422, если ключ уже использован с другим телом.
+        """
+        if not key:
+            return None
+
+        cached = self._cache_get((scope, key))
+        if cached is not None:
+            stored_hash, body = cached
+            self._check_hash(stored_hash, payload_hash)
+            return body
+
+        row = (
+            await db.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.response_body).where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.created_at > func.now() - timedelta(seconds=self._ttl_seconds),
+                )
+            )
+        ).first()
+        if row is None:
+            return None
+        self._check_hash(row.request_hash, payload_hash)
+        self._cache_put((scope, key), row.request_hash, row.response_body)
+        return row.response_body
+
+    async def commit_with_key(
+        self,
+        db: AsyncSession,
+        scope: str,
+        key: Optional[str],
+        payload_hash: str,
+        body: dict,
+    ) -> dict:
+        """
+        Закоммитить работу вместе с ответом под ключом.
+
+        Просроченная строка с тем же ключом (ещё не удалённая очисткой)
+        перезаписывается. Если живой ключ уже есть — параллельный повтор
+        закоммитился раньше: наша транзакция откатывается и возвращается
+        его ответ.
+        """
+        if not key:
+            await db.commit()
+            return body
+
+        stmt = insert(IdempotencyKey).values(
+            scope=scope, key=key, request_hash=payload_hash, response_body=body
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "response_body": stmt.excluded.response_body,
+                "created_at": func.now(),
+            },
+            where=IdempotencyKey.created_at <= func.now() - timedelta(seconds=self._ttl_seconds),
+        )
+        claimed = (await db.execute(stmt.returning(IdempotencyKey.key))).scalar()
+        if claimed is None:
+            await db.rollback()
+            stored = await self.lookup(db, scope, key, payload_hash)
+            if stored is None:
+                # ключ истёк между вставкой и чтением — повтор запишет его заново
+                raise HTTPException(409, "Срок Idempotency-Key истёк во время запроса, повторите")
+            return stored
+
+        await db.commit()
+        self._cache_put((scope, key), payload_hash, body)
+        return body
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.created_at < func.now() - timedelta(seconds=self._ttl_seconds)
+            )
+        )
+        return result.rowcount
+
+
+idempotency_store = IdempotencyStore(
+    maxsize=settings.idempotency_cache_size,
+    ttl_seconds=settings.idempotency_ttl_seconds,
+)
+
+
+async def run_idempotency_purge(interval_seconds: int) -> None:
+    """Фоновая очистка просроченных ключей из таблицы."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with AsyncSessionLocal() as session:
+                await idempotency_store.purge_expired(session)
+                await session.commit()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("idempotency purge failed")
@@ -0,0 +1,411 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    Date,
+    Float,
+    Integer,
+    Numeric,
+    Row,
+    and_,
+    case,
+    cast,
+    column,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models.daily_revenue import DailyRevenue
+from app.models.patient import Patient
+from app.models.payment import Payment, PaymentMethod, PaymentType
+from app.models.visit import Visit, PaymentStatus
+from app.schemas.payment import PaymentCreate
+from app.services.revenue import refresh_daily_finance, revenue_upsert
+
+logger = logging.getLogger(__name__)
+
+
+def money(expr):
+    """Округление до тиынов, чтобы сумма дельт не копила ошибку float."""
+    return func.round(cast(expr, Numeric), 2)
+
+
+async def apply_debt_delta(db: AsyncSession, patient_id: int, delta: float) -> None:
+    """
+    Patient.total_debt — счётчик, равный SUM(Visit.remaining) пациента.
+    Вызывать везде, где меняется Visit.remaining, с delta = новое - старое:
+    один атомарный UPDATE, без пересчёта по всем визитам.
+    """
+    if not delta:
+        return
+
+    new_debt = money(Patient.total_debt + delta)
+    await db.execute(
+        update(Patient)
+        .where(Patient.id == patient_id)
+        .values(total_debt=new_debt, has_debt=new_debt > 0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def payment_status_expr(remaining, total, paid):
+    """
+    SQL-версия правила статуса оплаты:
+    остаток 0 и было что оплачивать/оплачено -> оплачено, остаток меньше суммы -> частично.
+    """
+    status_type = Visit.__table__.c.payment_status.type
+    return case(
+        (and_(remaining == 0, or_(total > 0, paid > 0)), literal(PaymentStatus.paid, status_type)),
+        (remaining < total, literal(PaymentStatus.partial, status_type)),
+        else_=literal(PaymentStatus.unpaid, status_type),
+    )
+
+
+def payment_status_for(remaining: float, total: Optional[float], paid: float) -> PaymentStatus:
+    """
+    То же правило для значений в Python (завершение визита врачом).
+    Держать в согласии с payment_status_expr; total=None ведёт себя как NULL в SQL.
+    """
+    if remaining == 0 and ((total is not None and total > 0) or paid > 0):
+        return PaymentStatus.paid
+    if total is not None and remaining < total:
+        return PaymentStatus.partial
+    return PaymentStatus.unpaid
+
+
+async def apply_payment(db: AsyncSession, data: PaymentCreate) -> Optional[Row]:
+    """
+    Провести платёж одним выражением:
+
+        prev: строка визита FOR NO KEY UPDATE (старый remaining)
+        upd:  UPDATE visit: paid_amount += amount, remaining, payment_status
+        ins:  INSERT payment (только если пациент существует)
+        pat:  UPDATE patient: total_debt += (новый remaining - старый)
+        rev:  daily_revenue += платёж (день, врач, способ оплаты)
+
+    paid_amount увеличивается в SQL от текущего значения строки, поэтому
+    одновременные платежи по одному визиту не теряют обновлений.
+    Затем пересчитываются дни daily_finance по этому визиту (refresh_daily_finance).
+    Возвращает вставленный платёж или None, если нет визита/пациента —
+    тогда транзакцию нужно откатить.
+    """
+    amount = float(data.amount)
+    columns = Payment.__table__.c
+
+    prev = (
+        select(Visit.id, Visit.remaining.label("old_remaining"))
+        .where(Visit.id == data.visit_id)
+        # NO KEY UPDATE не конфликтует с KEY SHARE, который берут FK новых платежей
+        .with_for_update(key_share=True)
+        .cte("prev")
+    )
+
+    new_paid = Visit.paid_amount + amount
+    new_remaining = func.greatest(0.0, func.coalesce(Visit.total_amount, 0.0) - new_paid)
+    upd = (
+        update(Visit)
+        .where(Visit.id == prev.c.id)
+        .values(
+            paid_amount=new_paid,
+            remaining=new_remaining,
+            payment_status=payment_status_expr(new_remaining, Visit.total_amount, new_paid),
+        )
+        .returning(
+            Visit.id,
+            Visit.patient_id,
+            Visit.dentist_id,
+            Visit.remaining,
+            prev.c.old_remaining,
+        )
+        .cte("upd")
+    )
+
+    ins = (
+        insert(Payment)
+        .from_select(
+            ["visit_id", "patient_id", "amount", "method", "date", "payment_type"],
+            # типизированные литералы: asyncpg рендерит $n::тип, иначе в SELECT это text
+            select(
+                upd.c.id,
+                Patient.id,
+                literal(amount, columns.amount.type),
+                literal(PaymentMethod(data.method.value), columns.method.type),
+                literal(data.date, columns.date.type),
+                literal(PaymentType(data.payment_type.value), columns.payment_type.type),
+            ).where(Patient.id == data.patient_id),
+        )
+        .returning(
+            Payment.id,
+            Payment.visit_id,
+            Payment.patient_id,
+            Payment.amount,
+            Payment.method,
+            Payment.date,
+            Payment.payment_type,
+        )
+        .cte("ins")
+    )
+
+    new_debt = money(Patient.total_debt + upd.c.remaining - upd.c.old_remaining)
+    pat = (
+        update(Patient)
+        .where(Patient.id == upd.c.patient_id)
+        .values(total_debt=new_debt, has_debt=new_debt > 0)
+        .returning(Patient.id)
+        .cte("pat")
+    )
+
+    rev = (
+        revenue_upsert(
+            select(cast(ins.c.date, Date), upd.c.dentist_id, ins.c.method, ins.c.amount, literal(1))
+            .select_from(ins.join(upd, ins.c.visit_id == upd.c.id))
+        )
+        .returning(DailyRevenue.day)
+        .cte("rev")
+    )
+
+    stmt = select(ins).add_cte(pat).add_cte(rev)
+    result = await db.execute(stmt)
+    payment = result.first()
+    if payment is not None:
+        await refresh_daily_finance(db, [payment.visit_id])
+    return payment
+
+
+async def import_payments(db: AsyncSession, items: List[PaymentCreate]) -> Dict[str, int]:
+    """
+    Пакетное проведение платежей (выписки терминалов/банка) в текущей транзакции:
+    1) блокировка всех визитов, затем пациентов (она же проверка, что они есть)
+    2) один executemany INSERT в payment
+    3) одно set-based выражение: визиты получают сумму своих платежей,
+       пациенты — сумму изменений remaining своих визитов
+    4) один upsert в daily_revenue по (день, врач, способ оплаты)
+    5) пересчёт затронутых дней daily_finance
+    """
+    visit_ids = {item.visit_id for item in items}
+    patient_ids = {item.patient_id for item in items}
+
+    # Блокируем до INSERT в payment и в порядке id: визиты, потом пациенты
+    # (тот же порядок, что у apply_payment), поэтому параллельные импорты
+    # с общими визитами/пациентами выполняются по очереди, а не в deadlock.
+    # FOR NO KEY UPDATE не конфликтует с KEY SHARE от FK вставленных платежей.
+    locked_visits = await db.scalars(
+        select(Visit.id)
+        .where(Visit.id.in_(visit_ids))
+        .order_by(Visit.id)
+        .with_for_update(key_share=True)
+    )
+    missing_visits = sorted(visit_ids - set(locked_visits))
+    if missing_visits:
+        raise HTTPException(404, f"Визиты не найдены: {missing_visits}")
+    locked_patients = await db.scalars(
+        select(Patient.id)
+        .where(Patient.id.in_(patient_ids))
+        .order_by(Patient.id)
+        .with_for_update(key_share=True)
+    )
+    missing_patients = sorted(patient_ids - set(locked_patients))
+    if missing_patients:
+        raise HTTPException(404, f"Пациенты не найдены: {missing_patients}")
+
+    await db.execute(
+        insert(Payment),
+        [
+            dict(
+                visit_id=item.visit_id,
+                patient_id=item.patient_id,
+                amount=float(item.amount),
+                method=PaymentMethod(item.method.value),
+                date=item.date,
+                payment_type=PaymentType(item.payment_type.value),
+            )
+            for item in items
+        ],
+    )
+
+    per_visit: Dict[int, float] = defaultdict(float)
+    for item in items:
+        per_visit[item.visit_id] += float(item.amount)
+    totals = values(
+        column("visit_id", Integer),
+        column("amount", Float),
+        name="totals",
+    ).data(list(per_visit.items()))
+
+    # визиты уже заблокированы выше, remaining до платежей не изменится
+    prev = (
+        select(Visit.id, Visit.remaining.label("old_remaining"))
+        .where(Visit.id.in_(per_visit))
+        .cte("prev")
+    )
+    new_paid = Visit.paid_amount + totals.c.amount
+    new_remaining = func.greatest(0.0, func.coalesce(Visit.total_amount, 0.0) - new_paid)
+    upd = (
+        update(Visit)
+        .where(Visit.id == prev.c.id, Visit.id == totals.c.visit_id)
+        .values(
+            paid_amount=new_paid,
+            remaining=new_remaining,
+            payment_status=payment_status_expr(new_remaining, Visit.total_amount, new_paid),
+        )
+        .returning(Visit.patient_id, (Visit.remaining - prev.c.old_remaining).label("delta"))
+        .cte("upd")
+    )
+    deltas = (
+        select(upd.c.patient_id, func.sum(upd.c.delta).label("delta"))
+        .group_by(upd.c.patient_id)
+        .subquery()
+    )
+    new_debt = money(Patient.total_debt + deltas.c.delta)
+    result = await db.execute(
+        update(Patient)
+        .where(Patient.id == deltas.c.patient_id)
+        .values(total_debt=new_debt, has_debt=new_debt > 0)
+        .add_cte(upd)
+        .execution_options(synchronize_session=False)
+    )
+
+    batch = values(
+        column("visit_id", Integer),
+        column("day", Date),
+        column("method", Payment.__table__.c.method.type),
+        column("amount", Float),
+        name="batch",
+    ).data(
+        [
+            (item.visit_id, item.date.date(), PaymentMethod(item.method.value), float(item.amount))
+            for item in items
+        ]
+    )
+    await db.execute(
+        revenue_upsert(
+            select(batch.c.day, Visit.dentist_id, batch.c.method, func.sum(batch.c.amount), func.count())
+            .join(Visit, Visit.id == batch.c.visit_id)
+            .group_by(batch.c.day, Visit.dentist_id, batch.c.method)
+        )
+    )
+    await refresh_daily_finance(db, visit_ids)
+
+    return {
+        "imported": len(items),
+        "visits": len(per_visit),
+        "patients": result.rowcount,
+    }
+
+
+async def reconcile_patient_debt(
+    db: AsyncSession,
+    patient_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """
+    Сверка счётчика с полным SUM(Visit.remaining): исправляет только
+    разошедшиеся строки и возвращает их количество.
+    patient_ids — ограничить сверку этими пациентами.
+    """
+    ids = list(patient_ids) if patient_ids is not None else None
+
+    sums = select(
+        Visit.patient_id,
+        money(func.sum(Visit.remaining)).label("debt"),
+    ).group_by(Visit.patient_id)
+    if ids is not None:
+        sums = sums.where(Visit.patient_id.in_(ids))
+    sums = sums.subquery()
+
+    # пациенты с визитами
+    with_visits = await db.execute(
+        update(Patient)
+        .where(
+            Patient.id == sums.c.patient_id,
+            or_(Patient.total_debt != sums.c.debt, Patient.has_debt != (sums.c.debt > 0)),
+        )
+        .values(total_debt=sums.c.debt, has_debt=sums.c.debt > 0)
+        .execution_options(synchronize_session=False)
+    )
+
+    # пациенты без визитов, у которых почему-то числится долг
+    stmt = update(Patient).where(
+        ~exists().where(Visit.patient_id == Patient.id),
+        or_(Patient.total_debt != 0, Patient.has_debt.is_(True)),
+    )
+    if ids is not None:
+        stmt = stmt.where(Patient.id.in_(ids))
+    without_visits = await db.execute(
+        stmt.values(total_debt=0.0, has_debt=False).execution_options(synchronize_session=False)
+    )
+
+    return with_visits.rowcount + without_visits.rowcount
+
+
+async def reconcile_ledger(db: AsyncSession) -> Dict[str, int]:
+    """
+    Полная сверка учёта с таблицей payment, несколькими set-based UPDATE:
+    1) Visit.paid_amount = SUM(payment.amount), отсюда remaining и payment_status
+    2) Patient.total_debt / has_debt = SUM(Visit.remaining)
+    Трогает только разошедшиеся строки; возвращает их количество.
+    Запускать в REPEATABLE READ, чтобы параллельный платёж не был перезаписан
+    устаревшей суммой (см. app/cli.py).
+    """
+    paid = (
+        select(
+            Visit.id.label("visit_id"),
+            func.coalesce(func.sum(Payment.amount), 0.0).label("paid"),
+        )
+        .select_from(Visit)
+        .outerjoin(Payment, Payment.visit_id == Visit.id)
+        .group_by(Visit.id)
+        .subquery()
+    )
+    new_remaining = func.greatest(0.0, func.coalesce(Visit.total_amount, 0.0) - paid.c.paid)
+    new_status = payment_status_expr(new_remaining, Visit.total_amount, paid.c.paid)
+
+    visits = await db.execute(
+        update(Visit)
+        .where(
+            Visit.id == paid.c.visit_id,
+            or_(
+                money(Visit.paid_amount).is_distinct_from(money(paid.c.paid)),
+                money(Visit.remaining).is_distinct_from(money(new_remaining)),
+                Visit.payment_status.is_distinct_from(new_status),
+            ),
+        )
+        .values(paid_amount=paid.c.paid, remaining=new_remaining, payment_status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+
+    patients = await reconcile_patient_debt(db)
+
+    return {"visits": visits.rowcount, "patients": patients}
+
+
+async def run_debt_verifier(interval_seconds: int) -> None:
+    """
+    Фоновая сверка Patient.total_debt раз в interval_seconds.
+    REPEATABLE READ: если пациента в это время меняет платёж, транзакция
+    сверки падает с ошибкой сериализации и просто повторится в следующий раз,
+    а не перезапишет счётчик устаревшей суммой.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                fixed = await reconcile_patient_debt(session)
+                await session.commit()
+            if fixed:
+                logger.warning("debt verifier: fixed total_debt for %s patients", fixed)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("debt verifier failed")
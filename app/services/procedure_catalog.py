@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.procedure import Procedure
+
+settings = get_settings()
+
+_DIRTY_KEY = "procedure_catalog_dirty"
+
+
+@dataclass(frozen=True)
+class ProcedureInfo:
+    id: int
+    name: str
+    base_price: Optional[float]
+    duration_minutes: Optional[int]
+    is_active: bool
+
+
+class ProcedureCatalog:
+    """
+    Справочник процедур в памяти процесса.
+
+    Таблица procedure маленькая и меняется редко, поэтому читаем её целиком
+    один раз и перечитываем, только если:
+    - вырос счётчик версии (коммит, который менял процедуры, см. события ниже)
+    - истёк procedure_catalog_ttl_seconds (изменения из других воркеров)
+    """
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._items: Dict[int, ProcedureInfo] = {}
+        self._version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._fingerprint = ""
+        self._lock = asyncio.Lock()
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Отпечаток содержимого загруженного снимка (для ETag ответов, которые
+        рендерятся по справочнику). В отличие от счётчика версии одинаков во всех
+        воркерах с одинаковыми данными и меняется при перечитывании по TTL.
+        """
+        return self._fingerprint
+
+    def invalidate(self) -> None:
+        self._version += 1
+
+    def _is_fresh(self) -> bool:
+        if self._loaded_version != self._version:
+            return False
+        return time.monotonic() - self._loaded_at < self._ttl_seconds
+
+    async def snapshot(self, db: AsyncSession) -> Dict[int, ProcedureInfo]:
+        """Все процедуры (id -> ProcedureInfo), при необходимости перечитывает таблицу."""
+        if self._is_fresh():
+            return self._items
+
+        async with self._lock:
+            if self._is_fresh():
+                return self._items
+
+            version = self._version
+            result = await db.execute(
+                select(
+                    Procedure.id,
+                    Procedure.name,
+                    Procedure.base_price,
+                    Procedure.duration_minutes,
+                    Procedure.is_active,
+                )
+            )
+            self._items = {row.id: ProcedureInfo(**row._mapping) for row in result}
+            self._fingerprint = hashlib.sha1(
+                repr(sorted(self._items.items())).encode()
+            ).hexdigest()[:20]
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+            return self._items
+
+    async def get(self, db: AsyncSession, procedure_id: int) -> Optional[ProcedureInfo]:
+        items = await self.snapshot(db)
+        return items.get(procedure_id)
+
+
+procedure_catalog = ProcedureCatalog(ttl_seconds=settings.procedure_catalog_ttl_seconds)
+
+
+# -----------------------------
+# Инвалидация при записи в procedure
+# -----------------------------
+@event.listens_for(Session, "after_flush")
+def _track_procedure_flush(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Procedure):
+            session.info[_DIRTY_KEY] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_procedure_bulk(orm_execute_state) -> None:
+    # update(Procedure) / delete(Procedure) / insert(Procedure) мимо unit of work
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Procedure:
+        orm_execute_state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        procedure_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
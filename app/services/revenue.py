@@ -0,0 +1,140 @@
+from datetime import datetime, time, timedelta
+from typing import Iterable, Sequence
+
+from sqlalchemy import Date, Integer, Select, cast, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, Insert, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.daily_finance import DailyFinance
+from app.models.daily_revenue import DailyRevenue
+from app.models.payment import Payment
+from app.models.visit import Visit
+
+# пространство ключей pg_advisory_xact_lock(namespace, день) для daily_finance
+# (1 — расписание врача, см. app/api/routes_visits.py)
+FINANCE_LOCK_NAMESPACE = 2
+
+_DAILY_FINANCE_COLUMNS = ["day", "income", "debt", "visits_count", "patients_count"]
+
+
+def revenue_upsert(rows: Select) -> Insert:
+    """
+    Прибавить к daily_revenue строки rows с колонками
+    (day, dentist_id, method, amount, count): INSERT ... ON CONFLICT DO UPDATE.
+    """
+    stmt = insert(DailyRevenue).from_select(
+        ["day", "dentist_id", "method", "amount", "count"],
+        rows,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyRevenue.day, DailyRevenue.dentist_id, DailyRevenue.method],
+        set_={
+            "amount": DailyRevenue.amount + stmt.excluded.amount,
+            "count": DailyRevenue.count + stmt.excluded.count,
+        },
+    )
+
+
+async def backfill_daily_revenue(db: AsyncSession) -> int:
+    """Пересобрать daily_revenue целиком из payment. Возвращает число строк."""
+    await db.execute(delete(DailyRevenue))
+
+    day = cast(Payment.date, Date)
+    result = await db.execute(
+        insert(DailyRevenue).from_select(
+            ["day", "dentist_id", "method", "amount", "count"],
+            select(day, Visit.dentist_id, Payment.method, func.sum(Payment.amount), func.count())
+            .join(Visit, Visit.id == Payment.visit_id)
+            .group_by(day, Visit.dentist_id, Payment.method),
+        )
+    )
+    return result.rowcount
+
+
+def finance_rows(bucket, *conditions, dims: Sequence = ()) -> Select:
+    """
+    Финансы по периодам bucket (выражение от Payment.date) и колонкам dims
+    (Visit.dentist_id, Payment.method): bucket, dims..., income, debt,
+    visits_count, patients_count. Сначала группировка по (период, визит, dims),
+    чтобы остаток визита и его пациент считались в периоде один раз, затем по периоду.
+    """
+    per_visit = (
+        select(
+            bucket.label("bucket"),
+            *dims,
+            Visit.id.label("visit_id"),
+            Visit.patient_id,
+            Visit.remaining,
+            func.sum(Payment.amount).label("amount"),
+        )
+        .select_from(Payment)
+        .join(Visit, Visit.id == Payment.visit_id)
+        .where(*conditions)
+        .group_by(bucket, Visit.id, *dims)
+        .subquery()
+    )
+    dim_columns = [per_visit.c[dim.key] for dim in dims]
+    return select(
+        per_visit.c.bucket,
+        *dim_columns,
+        func.sum(per_visit.c.amount).label("income"),
+        func.coalesce(func.sum(per_visit.c.remaining), 0.0).label("debt"),
+        func.count().label("visits_count"),
+        func.count(per_visit.c.patient_id.distinct()).label("patients_count"),
+    ).group_by(per_visit.c.bucket, *dim_columns)
+
+
+async def refresh_daily_finance(db: AsyncSession, visit_ids: Iterable[int]) -> int:
+    """
+    Пересчитать в daily_finance дни, которые задела запись по визитам visit_ids:
+    все дни их платежей (остаток визита входит в долг каждого такого дня).
+    Вызывать в транзакции записи, после изменения payment/visit.
+    """
+    day = cast(Payment.date, Date)
+    days = (
+        await db.scalars(
+            select(day).where(Payment.visit_id.in_(list(visit_ids))).distinct().order_by(day)
+        )
+    ).all()
+    if not days:
+        return 0
+
+    # параллельные записи за тот же день пересчитывают его по очереди,
+    # иначе более поздний снимок может затереть более свежую сумму
+    ordinals = [d.toordinal() for d in days]
+    await db.execute(
+        select(
+            func.pg_advisory_xact_lock(
+                FINANCE_LOCK_NAMESPACE, func.unnest(literal(ordinals, ARRAY(Integer)))
+            )
+        )
+    )
+
+    stmt = insert(DailyFinance).from_select(
+        _DAILY_FINANCE_COLUMNS,
+        finance_rows(
+            day,
+            # диапазон — для индекса по payment.date, IN — сами дни
+            Payment.date >= datetime.combine(days[0], time.min),
+            Payment.date < datetime.combine(days[-1] + timedelta(days=1), time.min),
+            day.in_(days),
+        ),
+    )
+    result = await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DailyFinance.day],
+            set_={name: stmt.excluded[name] for name in _DAILY_FINANCE_COLUMNS[1:]},
+        )
+    )
+    return result.rowcount
+
+
+async def backfill_daily_finance(db: AsyncSession) -> int:
+    """Пересобрать daily_finance целиком из payment и visit. Возвращает число строк."""
+    await db.execute(delete(DailyFinance))
+    result = await db.execute(
+        insert(DailyFinance).from_select(
+            _DAILY_FINANCE_COLUMNS, finance_rows(cast(Payment.date, Date))
+        )
+    )
+    return result.rowcount
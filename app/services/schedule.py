@@ -0,0 +1,62 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+
+class BusyIntervals:
+    """
+    Занятые интервалы одного врача: отсортированы по началу и слиты,
+    если пересекаются или стыкуются. Поэтому концы тоже отсортированы,
+    и проверка/поиск окон — бинарный поиск, а не перебор визитов.
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = ()) -> None:
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            if self._ends and start <= self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        """Свободен ли [start, end): последний интервал, начавшийся до end, должен закончиться до start."""
+        i = bisect_left(self._starts, end) - 1
+        return i < 0 or self._ends[i] <= start
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Добавить занятый интервал (со слиянием соседей)."""
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+            del self._starts[lo:hi]
+            del self._ends[lo:hi]
+        self._starts.insert(lo, start)
+        self._ends.insert(lo, end)
+
+    def free_windows(
+        self,
+        window_start: datetime,
+        window_end: datetime,
+        min_duration: timedelta,
+    ) -> List[Interval]:
+        """Свободные окна внутри [window_start, window_end) длиной не меньше min_duration."""
+        windows: List[Interval] = []
+        cursor = window_start
+        i = bisect_right(self._ends, window_start)
+        while i < len(self._starts) and self._starts[i] < window_end:
+            if self._starts[i] - cursor >= min_duration:
+                windows.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+            i += 1
+        if window_end - cursor >= min_duration:
+            windows.append((cursor, window_end))
+        return windows
@@ -0,0 +1,134 @@
+"""
+Бенчмарк admin_dashboard: один запрос против прежних семи scalar-запросов
+на миллионе визитов (BENCH_ROWS в окружении — другой размер).
+"""
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Integer, String, case, cast, func, insert, literal, select
+
+from app.api import routes_dashboard
+from app.db.session import AsyncSessionLocal, engine
+from app.models.daily_revenue import DailyRevenue
+from app.models.patient import Patient
+from app.models.payment import Payment, PaymentMethod, PaymentType
+from app.models.visit import PaymentStatus, Visit, VisitStatus
+from app.services.revenue import backfill_daily_revenue
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+BENCH_ROWS = int(os.environ.get("BENCH_ROWS", 1_000_000))
+BENCH_PATIENTS = 10_000
+
+
+def _typed(value, column):
+    """Литерал enum с явным CAST: внутри CASE тип параметра иначе не вывести."""
+    return cast(literal(value, column.type), column.type)
+
+
+async def seed_visits_and_payments(seed, visits: int, patients: int) -> None:
+    """
+    visits визитов (по одному каждые 2 минуты назад от текущего момента)
+    у patients пациентов; каждый двадцатый с долгом, остальные оплачены
+    одним платежом. Вставка — INSERT ... SELECT по generate_series, затем
+    daily_revenue и VACUUM ANALYZE.
+    """
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    async with AsyncSessionLocal() as session:
+        g = func.generate_series(0, patients - 1, type_=Integer).column_valued("g")
+        await session.execute(
+            insert(Patient).from_select(
+                ["full_name", "phone", "total_debt", "has_debt"],
+                select(
+                    literal("Пациент ") + cast(g, String),
+                    literal("+8") + func.lpad(cast(g, String), 10, "0"),
+                    literal(0.0),
+                    literal(False),
+                ),
+            )
+        )
+        first_patient = await session.scalar(select(func.min(Patient.id)).where(Patient.id != seed.patient_id))
+
+        g = func.generate_series(0, visits - 1, type_=Integer).column_valued("g")
+        start = literal(now) - func.make_interval(0, 0, 0, 0, 0, g * 2)
+        has_debt = g % 20 == 0
+        await session.execute(
+            insert(Visit).from_select(
+                [
+                    "patient_id", "dentist_id", "date", "end_date", "total_amount",
+                    "paid_amount", "remaining", "payment_status", "visit_status",
+                ],
+                select(
+                    first_patient + g % patients,
+                    literal(seed.dentist_id),
+                    start,
+                    start + func.make_interval(0, 0, 0, 0, 0, 30),
+                    literal(100.0),
+                    case((has_debt, 0.0), else_=100.0),
+                    case((has_debt, 100.0), else_=0.0),
+                    case(
+                        (has_debt, _typed(PaymentStatus.unpaid, Visit.payment_status)),
+                        else_=_typed(PaymentStatus.paid, Visit.payment_status),
+                    ),
+                    _typed(VisitStatus.completed, Visit.visit_status),
+                ),
+            )
+        )
+        await session.execute(
+            insert(Payment).from_select(
+                ["visit_id", "patient_id", "amount", "method", "date", "payment_type"],
+                select(
+                    Visit.id,
+                    Visit.patient_id,
+                    Visit.paid_amount,
+                    _typed(PaymentMethod.card, Payment.method),
+                    Visit.end_date,
+                    _typed(PaymentType.full, Payment.payment_type),
+                ).where(Visit.paid_amount > 0),
+            )
+        )
+        await backfill_daily_revenue(session)
+        await session.commit()
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM ANALYZE")
+
+
+async def _seven_queries(db, today):
+    """admin_dashboard до перехода на один запрос: семь round-trip'ов."""
+    week_ago, month_ago, prev_month_ago = routes_dashboard._income_periods(today)
+    revenue = routes_dashboard._revenue
+    return (
+        await db.scalar(select(func.count(Visit.id))),
+        await db.scalar(select(func.count(Patient.id))),
+        await db.scalar(select(func.coalesce(func.sum(Visit.remaining), 0.0))),
+        await db.scalar(revenue()),
+        await db.scalar(revenue(DailyRevenue.day >= week_ago)),
+        await db.scalar(revenue(DailyRevenue.day >= month_ago)),
+        await db.scalar(revenue(DailyRevenue.day >= prev_month_ago, DailyRevenue.day < month_ago)),
+    )
+
+
+async def _single_statement(db, today):
+    return tuple((await db.execute(routes_dashboard._admin_dashboard_stmt(today))).one())
+
+
+async def test_admin_dashboard_single_statement_latency(seed, bench):
+    await seed_visits_and_payments(seed, BENCH_ROWS, BENCH_PATIENTS)
+    today = datetime.utcnow().date()
+
+    async with AsyncSessionLocal() as session:
+        old = await _seven_queries(session, today)
+        new = await _single_statement(session, today)
+        assert new == pytest.approx(old)
+
+        old_latency = await bench.latency(
+            f"admin_dashboard, 7 запросов, {BENCH_ROWS} визитов", lambda: _seven_queries(session, today)
+        )
+        new_latency = await bench.latency(
+            f"admin_dashboard, 1 запрос, {BENCH_ROWS} визитов", lambda: _single_statement(session, today)
+        )
+
+    assert new_latency.p50_ms < old_latency.p50_ms
@@ -0,0 +1,125 @@
+"""
+Бенчмарк проведения платежа: apply_payment (одно выражение с CTE) против
+прежнего пути через ORM — db.get визита и пациента, правка объектов, flush.
+Оба пути оставляют одинаковое состояние: платёж, суммы визита, долг
+пациента, daily_revenue и daily_finance.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Date, func, literal, select
+
+from app.db.session import AsyncSessionLocal
+from app.models.daily_revenue import DailyRevenue
+from app.models.patient import Patient
+from app.models.payment import Payment, PaymentMethod, PaymentType
+from app.models.visit import Visit
+from app.schemas.payment import PaymentCreate
+from app.services.ledger import apply_debt_delta, apply_payment, payment_status_for
+from app.services.revenue import refresh_daily_finance, revenue_upsert
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+# платежей в замере хватает на сотни прогонов: визит не закрывается
+VISIT_TOTAL = 1_000_000.0
+AMOUNT = 1.0
+REPEAT, WARMUP = 100, 5
+
+
+async def _visit_with_debt(seed) -> int:
+    async with AsyncSessionLocal() as session:
+        visit = Visit(
+            patient_id=seed.patient_id,
+            dentist_id=seed.dentist_id,
+            date=datetime(2026, 3, 2, 10),
+            end_date=datetime(2026, 3, 2, 10, 30),
+            total_amount=VISIT_TOTAL,
+            paid_amount=0.0,
+            remaining=VISIT_TOTAL,
+        )
+        session.add(visit)
+        patient = await session.get(Patient, seed.patient_id)
+        patient.total_debt += VISIT_TOTAL
+        patient.has_debt = True
+        await session.commit()
+        return visit.id
+
+
+def _payment(seed, visit_id: int) -> PaymentCreate:
+    return PaymentCreate(
+        visit_id=visit_id,
+        patient_id=seed.patient_id,
+        amount=AMOUNT,
+        method="наличные",
+        date=datetime(2026, 3, 2, 11),
+        payment_type="частичная",
+    )
+
+
+async def _orm_payment(db, data: PaymentCreate) -> Payment:
+    """create_payment до apply_payment: объекты визита и пациента в памяти, затем flush."""
+    visit = await db.get(Visit, data.visit_id)
+    patient = await db.get(Patient, data.patient_id)
+    assert visit is not None and patient is not None
+
+    payment = Payment(
+        visit_id=data.visit_id,
+        patient_id=data.patient_id,
+        amount=data.amount,
+        method=PaymentMethod(data.method.value),
+        date=data.date,
+        payment_type=PaymentType(data.payment_type.value),
+    )
+    db.add(payment)
+
+    old_remaining = visit.remaining
+    visit.paid_amount = visit.paid_amount + data.amount
+    visit.remaining = max(0.0, visit.total_amount - visit.paid_amount)
+    visit.payment_status = payment_status_for(visit.remaining, visit.total_amount, visit.paid_amount)
+    await apply_debt_delta(db, visit.patient_id, visit.remaining - old_remaining)
+    await db.flush()
+
+    columns = DailyRevenue.__table__.c
+    await db.execute(
+        revenue_upsert(
+            select(
+                literal(data.date.date(), Date),
+                literal(visit.dentist_id, columns.dentist_id.type),
+                literal(payment.method, columns.method.type),
+                literal(payment.amount, columns.amount.type),
+                literal(1),
+            )
+        )
+    )
+    await refresh_daily_finance(db, [visit.id])
+    await db.refresh(payment)
+    return payment
+
+
+async def test_apply_payment_latency_against_orm_path(seed, bench):
+    visit_id = await _visit_with_debt(seed)
+    data = _payment(seed, visit_id)
+
+    async def orm_path() -> None:
+        async with AsyncSessionLocal() as session:
+            await _orm_payment(session, data)
+            await session.commit()
+
+    async def single_statement() -> None:
+        async with AsyncSessionLocal() as session:
+            assert await apply_payment(session, data) is not None
+            await session.commit()
+
+    old = await bench.latency("платёж, db.get + flush", orm_path, repeat=REPEAT, warmup=WARMUP)
+    new = await bench.latency("платёж, apply_payment", single_statement, repeat=REPEAT, warmup=WARMUP)
+
+    runs = 2 * (REPEAT + WARMUP)
+    async with AsyncSessionLocal() as session:
+        visit = await session.get(Visit, visit_id)
+        patient = await session.get(Patient, seed.patient_id)
+        revenue = await session.scalar(select(func.sum(DailyRevenue.amount)))
+
+    assert visit.paid_amount == pytest.approx(runs * AMOUNT)
+    assert patient.total_debt == pytest.approx(VISIT_TOTAL - runs * AMOUNT)
+    assert revenue == pytest.approx(runs * AMOUNT)
+    assert new.p50_ms < old.p50_ms
@@ -0,0 +1,140 @@
+"""
+Бенчмарк списков: ORM-объекты против Row с колонками ответа.
+
+Для list_visits, list_payments и list_patients сравниваются прежний путь
+(select(Model) -> scalars() -> model_validate) и нынешний (запрос роута ->
+Row -> model_validate): пик памяти по tracemalloc и задержка p50/p99.
+Каждый прогон в новой сессии, чтобы identity map не копил объекты.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from app.api import routes_patients, routes_payments, routes_visits
+from app.core.pagination import MAX_PAGE_SIZE
+from app.db.session import AsyncSessionLocal
+from app.models.patient import Patient
+from app.models.payment import Payment, PaymentMethod, PaymentType
+from app.models.visit import Visit
+from app.schemas.patient import PatientRead
+from app.schemas.payment import PaymentRead
+from app.schemas.visit import VisitRead
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+PATIENTS = 5000
+VISITS = 5000
+START = datetime(2025, 1, 1, 9, 0)
+
+
+@pytest.fixture
+async def filled(seed):
+    async with AsyncSessionLocal() as session:
+        patient_ids = list(
+            await session.scalars(
+                insert(Patient).returning(Patient.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "full_name": f"Пациент {i}",
+                        "phone": f"+7{i:010d}",
+                        "email": f"patient{i}@example.com",
+                        "total_debt": 0.0,
+                        "has_debt": False,
+                    }
+                    for i in range(PATIENTS)
+                ],
+            )
+        )
+        visit_ids = list(
+            await session.scalars(
+                insert(Visit).returning(Visit.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "patient_id": patient_ids[i],
+                        "dentist_id": seed.dentist_id,
+                        "procedure": "Осмотр",
+                        "date": START + timedelta(hours=i),
+                        "end_date": START + timedelta(hours=i, minutes=30),
+                        "total_amount": 100.0,
+                        "paid_amount": 100.0,
+                        "remaining": 0.0,
+                    }
+                    for i in range(VISITS)
+                ],
+            )
+        )
+        await session.execute(
+            insert(Payment),
+            [
+                {
+                    "visit_id": visit_id,
+                    "patient_id": patient_ids[i],
+                    "amount": 100.0,
+                    "method": PaymentMethod.cash,
+                    "payment_type": PaymentType.full,
+                    "date": START + timedelta(hours=i, minutes=40),
+                }
+                for i, visit_id in enumerate(visit_ids)
+            ],
+        )
+        await session.commit()
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+    return seed
+
+
+def _orm(stmt, schema):
+    """Прежний путь: ORM-объекты целиком, затем схема ответа."""
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return [schema.model_validate(obj) for obj in (await session.scalars(stmt)).all()]
+
+    return run
+
+
+def _rows(stmt, schema):
+    """Нынешний путь: запрос роута, только колонки ответа."""
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return [schema.model_validate(row) for row in (await session.execute(stmt)).all()]
+
+    return run
+
+
+CASES = {
+    "list_visits": lambda: (
+        select(Visit).order_by(Visit.date.desc(), Visit.id.desc()).limit(MAX_PAGE_SIZE + 1),
+        routes_visits._visit_page_stmt(
+            date_from=None, date_to=None, dentist_id=None, patient_id=None, visit_status=None,
+            cursor=None, limit=MAX_PAGE_SIZE,
+        ),
+        VisitRead,
+    ),
+    "list_payments": lambda: (
+        select(Payment).order_by(Payment.date.desc(), Payment.id.desc()).limit(MAX_PAGE_SIZE + 1),
+        routes_payments._payment_page_stmt(
+            date_from=None, date_to=None, patient_id=None, visit_id=None, cursor=None, limit=MAX_PAGE_SIZE
+        ),
+        PaymentRead,
+    ),
+    "list_patients": lambda: (select(Patient), routes_patients._patients_stmt(), PatientRead),
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+async def test_row_projection_allocates_less_than_orm(filled, bench, name):
+    orm_stmt, row_stmt, schema = CASES[name]()
+    orm, rows = _orm(orm_stmt, schema), _rows(row_stmt, schema)
+
+    # у list_patients нет ORDER BY — сравниваются по id
+    assert sorted(await rows(), key=lambda item: item.id) == sorted(await orm(), key=lambda item: item.id)
+
+    orm_peak = await bench.allocations(f"{name}, ORM", orm)
+    row_peak = await bench.allocations(f"{name}, Row", rows)
+    await bench.latency(f"{name}, ORM", orm, repeat=50)
+    await bench.latency(f"{name}, Row", rows, repeat=50)
+
+    assert row_peak < orm_peak
@@ -0,0 +1,51 @@
+from app.services import dashboard_cache as module
+from app.services.dashboard_cache import DashboardCache
+
+
+def test_hit_until_table_is_bumped():
+    cache = DashboardCache(maxsize=10, ttl_seconds=60)
+    generation = cache.generation(("visit", "payment"))
+    value = cache.put("k", generation, {"total": 1})
+
+    assert cache.get("k", cache.generation(("visit", "payment"))) is value
+
+    cache.bump("patient")
+    assert cache.get("k", cache.generation(("visit", "payment"))) is value
+
+    cache.bump("payment")
+    assert cache.get("k", cache.generation(("visit", "payment"))) is None
+
+
+def test_write_during_computation_is_not_served_as_fresh():
+    cache = DashboardCache(maxsize=10, ttl_seconds=60)
+    generation = cache.generation(("visit",))  # снят до расчёта
+    cache.bump("visit")  # запись закоммитилась во время расчёта
+    cache.put("k", generation, "stale")
+    assert cache.get("k", cache.generation(("visit",))) is None
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    cache = DashboardCache(maxsize=10, ttl_seconds=30)
+    cache.put("k", (), "v")
+
+    now[0] += 29
+    assert cache.get("k", ()) == "v"
+    now[0] += 2
+    assert cache.get("k", ()) is None
+
+
+def test_lru_eviction_and_disabled_cache():
+    cache = DashboardCache(maxsize=2, ttl_seconds=60)
+    cache.put("a", (), 1)
+    cache.put("b", (), 2)
+    cache.get("a", ())
+    cache.put("c", (), 3)
+    assert cache.get("b", ()) is None
+    assert cache.get("a", ()) == 1
+    assert cache.get("c", ()) == 3
+
+    disabled = DashboardCache(maxsize=2, ttl_seconds=0)
+    assert disabled.put("a", (), 1) == 1
+    assert disabled.get("a", ()) is None
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Response
+from sqlalchemy import func, select
+from starlette.requests import Request
+
+from app.api.routes_dashboard import manager_debt_aging, manager_schedule
+from app.db.session import AsyncSessionLocal
+from app.models.visit import Visit
+from app.services.dashboard_cache import dashboard_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_debt_aging_without_debt(seed):
+    dashboard_cache.bump("visit")
+    async with AsyncSessionLocal() as session:
+        report = await manager_debt_aging(db=session, manager=seed.manager)
+
+    assert report.total.total == 0
+    assert report.byPatient == [] and report.byDentist == []
+
+
+async def test_debt_aging_buckets(seed):
+    today = datetime.utcnow().replace(hour=10, minute=0, second=0, microsecond=0)
+    async with AsyncSessionLocal() as session:
+        for days_ago, remaining in [(0, 100.0), (45, 20.0), (200, 5.0), (10, 0.0)]:
+            start = today - timedelta(days=days_ago)
+            session.add(
+                Visit(
+                    patient_id=seed.patient_id,
+                    dentist_id=seed.dentist_id,
+                    date=start,
+                    end_date=start + timedelta(minutes=30),
+                    total_amount=remaining,
+                    remaining=remaining,
+                )
+            )
+        await session.commit()
+
+    dashboard_cache.bump("visit")
+    async with AsyncSessionLocal() as session:
+        report = await manager_debt_aging(db=session, manager=seed.manager)
+
+    assert (report.total.days0to30, report.total.days31to60, report.total.days61to90, report.total.days90plus) == (
+        100.0,
+        20.0,
+        0.0,
+        5.0,
+    )
+    assert report.total.total == 125.0
+    assert [item.patientId for item in report.byPatient] == [seed.patient_id]
+    assert [item.dentistId for item in report.byDentist] == [seed.dentist_id]
+    assert report.byDentist[0].total == 125.0
+
+
+async def _schedule_etag(manager, day) -> str:
+    response = Response()
+    request = Request({"type": "http", "headers": []})
+    async with AsyncSessionLocal() as session:
+        await manager_schedule(request, response, db=session, manager=manager, date_value=day)
+    return response.headers["ETag"]
+
+
+async def test_schedule_etag_sees_late_commit_of_early_transaction(seed):
+    """
+    updated_at = now() — начало транзакции. Транзакция, начатая раньше и
+    закоммиченная позже, пишет время меньше уже отданного максимума;
+    ETag всё равно должен измениться.
+    """
+    start = datetime(2026, 3, 2, 10)
+    async with AsyncSessionLocal() as session:
+        visits = [
+            Visit(
+                patient_id=seed.patient_id,
+                dentist_id=seed.dentist_id,
+                date=start + timedelta(hours=i),
+                end_date=start + timedelta(hours=i, minutes=30),
+            )
+            for i in range(2)
+        ]
+        session.add_all(visits)
+        await session.commit()
+        first_id, second_id = visits[0].id, visits[1].id
+
+    async with AsyncSessionLocal() as early:
+        await early.scalar(select(func.now()))  # транзакция началась
+
+        async with AsyncSessionLocal() as late:
+            (await late.get(Visit, first_id)).procedure = "позже"
+            await late.commit()
+        etag_before = await _schedule_etag(seed.manager, start.date())
+
+        (await early.get(Visit, second_id)).procedure = "раньше"
+        await early.commit()
+
+    assert await _schedule_etag(seed.manager, start.date()) != etag_before
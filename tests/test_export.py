@@ -0,0 +1,65 @@
+import pytest
+
+from app.services import export as module
+from app.services.export import ExportFormat, export_response
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeStream:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def keys(self):
+        return ["id", "status"]
+
+    async def partitions(self):
+        yield self.rows
+
+
+class FakeSession:
+    def __init__(self, log, rows=()):
+        self.log = log
+        self.rows = list(rows)
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def stream(self, stmt):
+        self.log.append("stream")
+        return FakeStream(self.rows)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeStmt:
+    def execution_options(self, **options):
+        return self
+
+
+async def _body(response) -> str:
+    return "".join([chunk async for chunk in response.body_iterator])
+
+
+async def test_request_session_is_released_before_streaming(monkeypatch):
+    log = []
+    monkeypatch.setattr(module, "AsyncSessionLocal", lambda: FakeSession(log, [(1, "a"), (2, "b")]))
+
+    response = await export_response(FakeSession(log), FakeStmt(), ExportFormat.csv, "visits")
+    assert log == ["commit"]
+
+    assert (await _body(response)).splitlines() == ["id,status", "1,a", "2,b"]
+    assert log == ["commit", "stream"]
+    assert response.headers["content-disposition"] == 'attachment; filename="visits.csv"'
+
+
+async def test_ndjson_rows(monkeypatch):
+    log = []
+    monkeypatch.setattr(module, "AsyncSessionLocal", lambda: FakeSession(log, [(1, "a")]))
+
+    response = await export_response(FakeSession(log), FakeStmt(), ExportFormat.ndjson, "payments")
+    assert await _body(response) == '{"id": 1, "status": "a"}\n'
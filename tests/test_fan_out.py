@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app.db import session as module
+from app.db.session import fan_out
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def test_releases_request_session_and_bounds_concurrency(monkeypatch):
+    log = []
+    monkeypatch.setattr(module, "AsyncSessionLocal", lambda: FakeSession(log))
+    running = 0
+    peak = 0
+
+    def query(value):
+        async def run(session):
+            nonlocal running, peak
+            log.append("query")
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01 * (5 - value))
+            running -= 1
+            return value
+
+        return run
+
+    results = await fan_out(FakeSession(log), *(query(i) for i in range(5)), limit=2)
+
+    assert results == [0, 1, 2, 3, 4]
+    assert log[0] == "commit"
+    assert peak == 2
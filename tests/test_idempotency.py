@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import idempotency as module
+from app.services.idempotency import IdempotencyStore, request_hash
+
+pytestmark = pytest.mark.anyio
+
+HASH = request_hash({"amount": 100})
+
+
+class FakeResult:
+    def __init__(self, row=None, value=None):
+        self.row = row
+        self.value = value
+
+    def first(self):
+        return self.row
+
+    def scalar(self):
+        return self.value
+
+
+class FakeSession:
+    """
+    Минимум AsyncSession для IdempotencyStore: execute / commit / rollback.
+    stored — (request_hash, body) живого ключа в таблице; conflict — вставка ключа
+    упирается в живую строку (ON CONFLICT ничего не обновил).
+    """
+
+    def __init__(self, stored=None, conflict=False):
+        self.stored = stored
+        self.conflict = conflict
+        self.queries = 0
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, stmt):
+        if stmt.is_insert:
+            self.added.append(stmt.compile().params)
+            return FakeResult(value=None if self.conflict else self.added[-1]["key"])
+        self.queries += 1
+        if self.stored is None:
+            return FakeResult()
+        stored_hash, body = self.stored
+        return FakeResult(row=SimpleNamespace(request_hash=stored_hash, response_body=body))
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+async def test_no_key_skips_storage():
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    db = FakeSession()
+    assert await store.lookup(db, "scope", None, HASH) is None
+    assert await store.commit_with_key(db, "scope", None, HASH, {"id": 1}) == {"id": 1}
+    assert db.queries == 0 and db.added == [] and db.commits == 1
+
+
+async def test_committed_response_is_served_from_memory():
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    db = FakeSession()
+    assert await store.lookup(db, "scope", "k", HASH) is None
+    assert db.queries == 1
+
+    await store.commit_with_key(db, "scope", "k", HASH, {"id": 1})
+    assert db.added[0]["key"] == "k" and db.added[0]["request_hash"] == HASH
+
+    assert await store.lookup(db, "scope", "k", HASH) == {"id": 1}
+    assert await store.lookup(db, "other", "k", HASH) is None
+    assert db.queries == 2
+
+
+async def test_memory_entry_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    await store.commit_with_key(FakeSession(), "scope", "k", HASH, {"id": 1})
+
+    now[0] += 61
+    db = FakeSession()
+    assert await store.lookup(db, "scope", "k", HASH) is None
+    assert db.queries == 1
+
+
+async def test_concurrent_duplicate_returns_winner_response():
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    db = FakeSession(stored=(HASH, {"id": 7}), conflict=True)
+    assert await store.commit_with_key(db, "scope", "k", HASH, {"id": 8}) == {"id": 7}
+    assert db.rollbacks == 1 and db.commits == 0
+
+
+async def test_key_expired_during_request_asks_to_retry():
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    db = FakeSession(conflict=True)
+    with pytest.raises(HTTPException) as exc:
+        await store.commit_with_key(db, "scope", "k", HASH, {"id": 8})
+    assert exc.value.status_code == 409
+    assert db.rollbacks == 1 and db.commits == 0
+
+
+async def test_reused_key_with_other_body_is_rejected():
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    other = request_hash({"amount": 200})
+
+    # из таблицы
+    with pytest.raises(HTTPException) as exc:
+        await store.lookup(FakeSession(stored=(HASH, {"id": 1})), "scope", "k", other)
+    assert exc.value.status_code == 422
+
+    # из памяти процесса
+    await store.commit_with_key(FakeSession(), "scope", "k2", HASH, {"id": 2})
+    with pytest.raises(HTTPException) as exc:
+        await store.lookup(FakeSession(), "scope", "k2", other)
+    assert exc.value.status_code == 422
+
+
+async def test_key_stored_without_hash_matches_any_body():
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    db = FakeSession(stored=(None, {"id": 1}))
+    assert await store.lookup(db, "scope", "k", HASH) == {"id": 1}
+
+
+def test_request_hash_ignores_key_order():
+    assert request_hash({"a": 1, "b": 2}) == request_hash({"b": 2, "a": 1})
+    assert request_hash({"a": 1}) != request_hash({"a": 2})
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from sqlalchemy import func, select
+
+from app.api.routes_payments import create_payment
+from app.db.session import AsyncSessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.models.payment import Payment
+from app.models.visit import Visit
+from app.schemas.payment import PaymentCreate
+from app.services.idempotency import IdempotencyStore, idempotency_store, request_hash
+
+pytestmark = pytest.mark.anyio
+
+
+def _payment(seed, visit_id: int, amount: float) -> PaymentCreate:
+    return PaymentCreate(
+        visit_id=visit_id,
+        patient_id=seed.patient_id,
+        amount=amount,
+        method="наличные",
+        date=datetime(2026, 3, 2, 11),
+        payment_type="частичная",
+    )
+
+
+async def test_expired_key_not_yet_purged_is_reused(seed):
+    store = IdempotencyStore(maxsize=10, ttl_seconds=60)
+    async with AsyncSessionLocal() as session:
+        session.add(
+            IdempotencyKey(
+                scope="scope",
+                key="k",
+                request_hash=request_hash({"old": True}),
+                response_body={"id": 1},
+                created_at=datetime.utcnow() - timedelta(days=2),
+            )
+        )
+        await session.commit()
+
+    payload_hash = request_hash({"new": True})
+    async with AsyncSessionLocal() as session:
+        assert await store.lookup(session, "scope", "k", payload_hash) is None
+        assert await store.commit_with_key(session, "scope", "k", payload_hash, {"id": 2}) == {"id": 2}
+
+    async with AsyncSessionLocal() as session:
+        row = await session.get(IdempotencyKey, ("scope", "k"))
+    assert row.response_body == {"id": 2}
+    assert row.request_hash == payload_hash
+
+
+async def test_reused_payment_key_with_other_body_is_rejected(seed):
+    async with AsyncSessionLocal() as session:
+        visit = Visit(
+            patient_id=seed.patient_id,
+            dentist_id=seed.dentist_id,
+            date=datetime(2026, 3, 2, 10),
+            end_date=datetime(2026, 3, 2, 10, 30),
+        )
+        session.add(visit)
+        await session.commit()
+        visit_id = visit.id
+    manager = seed.manager
+
+    async with AsyncSessionLocal() as session:
+        await create_payment(_payment(seed, visit_id, 100.0), db=session, current_user=manager, idempotency_key="pay-1")
+    async with AsyncSessionLocal() as session:
+        repeat = await create_payment(
+            _payment(seed, visit_id, 100.0), db=session, current_user=manager, idempotency_key="pay-1"
+        )
+    assert repeat["amount"] == 100.0
+
+    idempotency_store._cache.clear()  # ответ из таблицы, а не из памяти процесса
+    async with AsyncSessionLocal() as session:
+        with pytest.raises(HTTPException) as exc:
+            await create_payment(
+                _payment(seed, visit_id, 250.0), db=session, current_user=manager, idempotency_key="pay-1"
+            )
+    assert exc.value.status_code == 422
+
+    async with AsyncSessionLocal() as session:
+        assert await session.scalar(select(func.count()).select_from(Payment)) == 1
@@ -0,0 +1,246 @@
+"""
+Запросы списков и дашбордов идут по индексам.
+
+Таблицы заполняются, ANALYZE обновляет статистику, seq scan запрещён:
+если подходящего индекса нет, планировщик всё равно выберет Seq Scan,
+и тест это поймает. Кроме того, в плане должен быть ожидаемый индекс —
+иначе «индексом» мог бы оказаться полный проход по первичному ключу.
+EXPLAIN делается по тем же функциям-сборщикам запросов, что исполняют роуты.
+"""
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Set
+
+import pytest
+from sqlalchemy import insert, text
+
+from app.api import routes_dashboard, routes_patients, routes_payments, routes_visits
+from app.db.session import AsyncSessionLocal
+from app.models.daily_revenue import DailyRevenue
+from app.models.patient import Patient
+from app.models.payment import Payment, PaymentMethod, PaymentType
+from app.models.visit import Visit
+from app.schemas.dashboard import FinanceGranularity
+from app.services.revenue import backfill_daily_finance, backfill_daily_revenue
+
+pytestmark = pytest.mark.anyio
+
+PATIENTS = 1000
+VISITS = 5000
+START = datetime(2025, 1, 1, 9, 0)
+DAY = datetime(2025, 6, 2)
+
+
+@pytest.fixture
+async def filled(seed):
+    """Год визитов и платежей; долг у каждого двадцатого."""
+    async with AsyncSessionLocal() as session:
+        patient_ids = list(
+            await session.scalars(
+                insert(Patient).returning(Patient.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "full_name": f"Пациент {i}",
+                        "phone": f"+7{i:010d}",
+                        "total_debt": 100.0 if i % 20 == 0 else 0.0,
+                        "has_debt": i % 20 == 0,
+                    }
+                    for i in range(PATIENTS)
+                ],
+            )
+        )
+        visit_ids = list(
+            await session.scalars(
+                insert(Visit).returning(Visit.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "patient_id": patient_ids[i % PATIENTS],
+                        "dentist_id": seed.dentist_id,
+                        "date": START + timedelta(hours=i),
+                        "end_date": START + timedelta(hours=i, minutes=30),
+                        "total_amount": 100.0,
+                        "paid_amount": 0.0 if i % 20 == 0 else 100.0,
+                        "remaining": 100.0 if i % 20 == 0 else 0.0,
+                    }
+                    for i in range(VISITS)
+                ],
+            )
+        )
+        await session.execute(
+            insert(Payment),
+            [
+                {
+                    "visit_id": visit_id,
+                    "patient_id": patient_ids[i % PATIENTS],
+                    "amount": 100.0,
+                    "method": PaymentMethod.cash,
+                    "payment_type": PaymentType.full,
+                    "date": START + timedelta(hours=i, minutes=40),
+                }
+                for i, visit_id in enumerate(visit_ids)
+                if i % 20
+            ],
+        )
+        await backfill_daily_revenue(session)
+        await backfill_daily_finance(session)
+        await session.commit()
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+    return seed
+
+
+def _uses(*names: str) -> Set[str]:
+    """Группа индексов: в плане должен быть хотя бы один из них."""
+    return set(names)
+
+
+VISIT_PK = _uses("visit_pkey", "ix_visit_id")
+
+
+def _queries(seed):
+    """
+    Имя -> (запрос роута, группы индексов). Запросы собирают те же функции,
+    что исполняют роуты; пустой список групп — чтение всей небольшой таблицы,
+    проверяется только отсутствие Seq Scan.
+    """
+    day = DAY.date()
+    day_start, day_end = DAY, DAY + timedelta(days=1)
+    month_ago = day - timedelta(days=30)
+    dentist_income = dict(
+        zip(("dentist_income_week", "dentist_income_month", "dentist_income_prev_month"),
+            routes_dashboard._dentist_income_stmts(seed.dentist_id, day))
+    )
+    no_visit_filters = dict(date_from=None, date_to=None, dentist_id=None, patient_id=None, visit_status=None)
+    return {
+        # /visits
+        "visits_page": (
+            routes_visits._visit_page_stmt(**no_visit_filters, cursor=None, limit=50),
+            [_uses("ix_visit_date_id")],
+        ),
+        "visits_page_dentist_period": (
+            routes_visits._visit_page_stmt(
+                **{**no_visit_filters, "dentist_id": seed.dentist_id, "date_from": day_start, "date_to": day_end},
+                cursor=None,
+                limit=50,
+            ),
+            [_uses("ix_visit_dentist_id_date", "ix_visit_date_id")],
+        ),
+        "visits_page_patient": (
+            routes_visits._visit_page_stmt(
+                **{**no_visit_filters, "patient_id": seed.patient_id}, cursor=None, limit=50
+            ),
+            [_uses("ix_visit_patient_id")],
+        ),
+        "visits_export": (
+            routes_visits._visit_export_stmt(**{**no_visit_filters, "date_from": day_start, "date_to": day_end}),
+            [_uses("ix_visit_date_id")],
+        ),
+        "availability": (
+            routes_visits._busy_intervals_stmt(day_start, day_end, None),
+            [_uses("ix_visit_date_id")],
+        ),
+        "availability_dentist": (
+            routes_visits._busy_intervals_stmt(day_start, day_end, seed.dentist_id),
+            [_uses("ix_visit_dentist_id_date")],
+        ),
+        "overlap_check": (
+            routes_visits._overlap_stmt(
+                seed.dentist_id, day_start + timedelta(hours=10), day_start + timedelta(hours=11)
+            ),
+            [_uses("ix_visit_dentist_id_date", "ix_visit_dentist_id_end_date")],
+        ),
+        "bulk_schedule_window": (
+            routes_visits._dentist_window_stmt(seed.dentist_id, day_start, day_end + timedelta(days=7)),
+            [_uses("ix_visit_dentist_id_date", "ix_visit_dentist_id_end_date")],
+        ),
+        # /payments
+        "payments_page": (
+            routes_payments._payment_page_stmt(
+                date_from=day, date_to=day, patient_id=None, visit_id=None, cursor=None, limit=50
+            ),
+            [_uses("ix_payment_date_id")],
+        ),
+        "payments_of_visit": (
+            routes_payments._payment_page_stmt(
+                date_from=None, date_to=None, patient_id=None, visit_id=42, cursor=None, limit=50
+            ),
+            [_uses("ix_payment_visit_id")],
+        ),
+        "payments_of_patient": (
+            routes_payments._payment_page_stmt(
+                date_from=None, date_to=None, patient_id=seed.patient_id, visit_id=None, cursor=None, limit=50
+            ),
+            [_uses("ix_payment_patient_id")],
+        ),
+        "manager_payments_page": (
+            routes_payments._manager_payment_page_stmt(date_from=day, date_to=day, cursor=None, limit=50),
+            [_uses("ix_payment_date_id"), VISIT_PK],
+        ),
+        "manager_payments_export": (
+            routes_payments._manager_payment_export_stmt(date_from=month_ago, date_to=day),
+            [_uses("ix_payment_date_id"), VISIT_PK],
+        ),
+        # /patients
+        "patients": (routes_patients._patients_stmt(), []),
+        "debtors_page": (
+            routes_patients._debtors_page_stmt(cursor=None, limit=50),
+            [_uses("ix_patient_debtors")],
+        ),
+        # /dashboard
+        "admin_dashboard": (
+            routes_dashboard._admin_dashboard_stmt(day),
+            [_uses("ix_visit_date_debt"), _uses("daily_revenue_pkey")],
+        ),
+        "admin_finance_daily": (
+            routes_dashboard._admin_finance_stmt(month_ago, day, FinanceGranularity.day),
+            [_uses("daily_finance_pkey")],
+        ),
+        "admin_finance_by_dentist_and_method": (
+            routes_dashboard._admin_finance_stmt(
+                month_ago, day, FinanceGranularity.week, (Visit.dentist_id, Payment.method)
+            ),
+            [_uses("ix_payment_date_id")],
+        ),
+        "admin_staff": (routes_dashboard._staff_stmt(), []),
+        "dentist_today_visits": (
+            routes_dashboard._day_visits_stmt(day, seed.dentist_id),
+            [_uses("ix_visit_dentist_id_date")],
+        ),
+        **{name: (stmt, [_uses("daily_revenue_pkey")]) for name, stmt in dentist_income.items()},
+        "manager_today_visits": (routes_dashboard._day_visits_stmt(day), [_uses("ix_visit_date_id")]),
+        "manager_income_today": (
+            routes_dashboard._revenue(DailyRevenue.day == day),
+            [_uses("daily_revenue_pkey")],
+        ),
+        "manager_total_debt": (routes_dashboard._total_debt_stmt(), [_uses("ix_visit_date_debt")]),
+        "debt_aging": (routes_dashboard._debt_aging_stmt(day), [_uses("ix_visit_date_debt")]),
+        "schedule_version": (routes_dashboard._schedule_version_stmt(day), [_uses("ix_visit_date_id")]),
+    }
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+@pytest.mark.parametrize("name", list(_queries(SimpleNamespace(dentist_id=0, patient_id=0))))
+async def test_hot_query_uses_index(filled, name):
+    stmt, required = _queries(filled)[name]
+
+    async with AsyncSessionLocal() as session:
+        # мимо text(): в литералах времени ':00' читалось бы как параметр
+        conn = await session.connection()
+        sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_plan_nodes(plan[0]["Plan"]))
+
+    assert not [node for node in nodes if node["Node Type"] == "Seq Scan"], json.dumps(plan, indent=1)
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    for group in required:
+        assert used & group, (group, json.dumps(plan, indent=1))
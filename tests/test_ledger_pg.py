@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+from app.api.routes_visits import complete_visit_by_dentist
+from app.db.session import AsyncSessionLocal
+from app.models.daily_finance import DailyFinance
+from app.models.daily_revenue import DailyRevenue
+from app.models.patient import Patient
+from app.models.visit import PaymentStatus, Visit
+from app.schemas.payment import PaymentCreate
+from app.schemas.visit import VisitCompleteByDentist
+from app.services.ledger import apply_payment, import_payments
+
+pytestmark = pytest.mark.anyio
+
+PARALLEL_PAYMENTS = 20
+VISIT_TOTAL = 1000.0
+
+
+async def _visit_with_debt(seed) -> int:
+    async with AsyncSessionLocal() as session:
+        visit = Visit(
+            patient_id=seed.patient_id,
+            dentist_id=seed.dentist_id,
+            date=datetime(2026, 3, 2, 10),
+            end_date=datetime(2026, 3, 2, 10, 30),
+            total_amount=VISIT_TOTAL,
+            paid_amount=0.0,
+            remaining=VISIT_TOTAL,
+        )
+        session.add(visit)
+        patient = await session.get(Patient, seed.patient_id)
+        patient.total_debt += VISIT_TOTAL
+        patient.has_debt = True
+        await session.commit()
+        return visit.id
+
+
+def _payment(seed, visit_id: int, amount: float) -> PaymentCreate:
+    return PaymentCreate(
+        visit_id=visit_id,
+        patient_id=seed.patient_id,
+        amount=amount,
+        method="наличные",
+        date=datetime(2026, 3, 2, 11),
+        payment_type="частичная",
+    )
+
+
+async def test_parallel_payments_on_one_visit_lose_nothing(seed):
+    visit_id = await _visit_with_debt(seed)
+    amounts = [10.0 + i for i in range(PARALLEL_PAYMENTS)]
+
+    async def pay(amount: float) -> None:
+        async with AsyncSessionLocal() as session:
+            assert await apply_payment(session, _payment(seed, visit_id, amount)) is not None
+            await session.commit()
+
+    await asyncio.gather(*(pay(amount) for amount in amounts))
+
+    paid = sum(amounts)
+    async with AsyncSessionLocal() as session:
+        visit = await session.get(Visit, visit_id)
+        patient = await session.get(Patient, seed.patient_id)
+        revenue = await session.scalar(select(func.sum(DailyRevenue.amount)))
+        finance = await session.get(DailyFinance, datetime(2026, 3, 2).date())
+
+    assert visit.paid_amount == pytest.approx(paid)
+    assert visit.remaining == pytest.approx(VISIT_TOTAL - paid)
+    assert visit.payment_status == PaymentStatus.partial
+    assert patient.total_debt == pytest.approx(VISIT_TOTAL - paid)
+    assert patient.has_debt
+    assert revenue == pytest.approx(paid)
+    assert finance.income == pytest.approx(paid)
+    assert finance.debt == pytest.approx(VISIT_TOTAL - paid)
+    assert finance.visits_count == 1
+
+
+async def test_parallel_imports_sharing_visits_do_not_deadlock(seed):
+    visit_ids = [await _visit_with_debt(seed) for _ in range(3)]
+
+    async def run_import(order) -> None:
+        async with AsyncSessionLocal() as session:
+            await import_payments(session, [_payment(seed, visit_id, 5.0) for visit_id in order])
+            await session.commit()
+
+    await asyncio.gather(*(run_import(visit_ids if i % 2 else visit_ids[::-1]) for i in range(10)))
+
+    async with AsyncSessionLocal() as session:
+        paid = await session.scalars(select(Visit.paid_amount).where(Visit.id.in_(visit_ids)))
+        patient = await session.get(Patient, seed.patient_id)
+
+    assert list(paid) == [pytest.approx(50.0)] * 3
+    assert patient.total_debt == pytest.approx(3 * VISIT_TOTAL - 150.0)
+
+
+async def test_completion_racing_payments_keeps_debt_consistent(seed):
+    """Завершение визита с новой суммой параллельно с платежами: долг = сумма - оплачено."""
+    visit_id = await _visit_with_debt(seed)
+    amounts = [10.0 + i for i in range(PARALLEL_PAYMENTS)]
+    final_total = 600.0
+
+    async def pay(amount: float) -> None:
+        async with AsyncSessionLocal() as session:
+            await apply_payment(session, _payment(seed, visit_id, amount))
+            await session.commit()
+
+    async def complete() -> None:
+        async with AsyncSessionLocal() as session:
+            await complete_visit_by_dentist(
+                visit_id,
+                VisitCompleteByDentist(total_amount=final_total),
+                db=session,
+                dentist=SimpleNamespace(id=seed.dentist_id),
+            )
+
+    payments = [pay(amount) for amount in amounts]
+    await asyncio.gather(*payments[:10], complete(), *payments[10:])
+
+    paid = sum(amounts)
+    async with AsyncSessionLocal() as session:
+        visit = await session.get(Visit, visit_id)
+        patient = await session.get(Patient, seed.patient_id)
+
+    assert visit.total_amount == final_total
+    assert visit.paid_amount == pytest.approx(paid)
+    assert visit.remaining == pytest.approx(final_total - paid)
+    assert patient.total_debt == pytest.approx(final_total - paid)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 1, 23, 9, 38, 27, 615092)
+    cursor = encode_cursor(moment, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, datetime, int) == [moment, 42]
+    assert decode_cursor(encode_cursor(12.5, 3), float, int) == [12.5, 3]
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor(1), encode_cursor("x", 1)])
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, datetime, int)
+    assert exc.value.status_code == 400
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import create_engine, literal, select
+
+from app.models.visit import PaymentStatus
+from app.services.ledger import payment_status_expr, payment_status_for
+
+CASES = [
+    # remaining, total, paid, ожидаемый статус
+    (0.0, 1000.0, 1000.0, PaymentStatus.paid),
+    (0.0, 1000.0, 1200.0, PaymentStatus.paid),
+    (0.0, 0.0, 50.0, PaymentStatus.paid),
+    (0.0, 0.0, 0.0, PaymentStatus.unpaid),
+    (0.0, None, 0.0, PaymentStatus.unpaid),
+    (400.0, 1000.0, 600.0, PaymentStatus.partial),
+    (1000.0, 1000.0, 0.0, PaymentStatus.unpaid),
+]
+
+
+@pytest.mark.parametrize("remaining,total,paid,expected", CASES)
+def test_payment_status_rule(remaining, total, paid, expected):
+    assert payment_status_for(remaining, total, paid) == expected
+
+
+@pytest.mark.parametrize("remaining,total,paid,expected", CASES)
+def test_python_rule_matches_sql_rule(remaining, total, paid, expected):
+    engine = create_engine("sqlite://")
+    expr = payment_status_expr(literal(remaining), literal(total), literal(paid))
+    with engine.connect() as conn:
+        assert conn.scalar(select(expr)) == payment_status_for(remaining, total, paid)
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.procedure_catalog import ProcedureCatalog
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return [
+            SimpleNamespace(id=row["id"], _mapping=row)
+            for row in self.rows
+        ]
+
+
+def procedure(id_, price):
+    return {"id": id_, "name": f"Процедура {id_}", "base_price": price, "duration_minutes": 30, "is_active": True}
+
+
+async def test_fingerprint_depends_on_content_only():
+    first, second = ProcedureCatalog(ttl_seconds=60), ProcedureCatalog(ttl_seconds=60)
+    second.invalidate()  # другая версия в другом воркере
+
+    await first.snapshot(FakeSession([procedure(1, 100.0), procedure(2, 50.0)]))
+    await second.snapshot(FakeSession([procedure(2, 50.0), procedure(1, 100.0)]))
+    assert first.fingerprint == second.fingerprint != ""
+
+    first.invalidate()
+    await first.snapshot(FakeSession([procedure(1, 120.0), procedure(2, 50.0)]))
+    assert first.fingerprint != second.fingerprint
+
+
+async def test_snapshot_is_cached_until_invalidated():
+    catalog = ProcedureCatalog(ttl_seconds=60)
+    db = FakeSession([procedure(1, 100.0)])
+    await catalog.snapshot(db)
+    await catalog.snapshot(db)
+    assert db.queries == 1
+
+    catalog.invalidate()
+    assert (await catalog.snapshot(db))[1].base_price == 100.0
+    assert db.queries == 2
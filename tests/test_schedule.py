@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from app.services.schedule import BusyIntervals
+
+
+def at(hour, minute=0):
+    return datetime(2026, 3, 2, hour, minute)
+
+
+def test_overlapping_and_adjacent_intervals_merge():
+    busy = BusyIntervals([(at(11), at(12)), (at(9), at(10)), (at(10), at(10, 30)), (at(11, 30), at(13))])
+    assert len(busy) == 2
+    assert busy.free_windows(at(8), at(14), timedelta(minutes=1)) == [
+        (at(8), at(9)),
+        (at(10, 30), at(11)),
+        (at(13), at(14)),
+    ]
+
+
+def test_is_free_treats_ends_as_open():
+    busy = BusyIntervals([(at(10), at(11))])
+    assert busy.is_free(at(9), at(10))
+    assert busy.is_free(at(11), at(12))
+    assert not busy.is_free(at(10, 59), at(11, 30))
+    assert not busy.is_free(at(9), at(12))
+    assert BusyIntervals().is_free(at(9), at(10))
+
+
+def test_add_merges_neighbours():
+    busy = BusyIntervals([(at(9), at(10)), (at(11), at(12))])
+    busy.add(at(10), at(11))
+    assert len(busy) == 1
+    assert not busy.is_free(at(10, 15), at(10, 45))
+
+    busy.add(at(14), at(15))
+    assert len(busy) == 2
+    assert busy.is_free(at(12), at(14))
+
+
+def test_free_windows_respects_min_duration():
+    busy = BusyIntervals([(at(9, 20), at(10)), (at(10, 20), at(12))])
+    windows = busy.free_windows(at(9), at(13), timedelta(minutes=30))
+    assert windows == [(at(12), at(13))]
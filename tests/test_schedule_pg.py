@@ -0,0 +1,140 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import aliased
+
+from app.api.routes_visits import _lock_dentist_schedule, complete_visit_by_dentist, create_visit_by_manager
+from app.db.session import AsyncSessionLocal
+from app.models.user import User, UserRole
+from app.models.visit import Visit
+from app.schemas.visit import VisitCompleteByDentist, VisitCreate
+
+pytestmark = pytest.mark.anyio
+
+DENTISTS = 5
+PARALLEL_BOOKINGS = 300
+START = datetime(2026, 3, 2, 10, 0)
+
+
+async def _add_dentists(count: int) -> list:
+    async with AsyncSessionLocal() as session:
+        dentists = [
+            User(
+                full_name=f"Стоматолог {i}", phone=f"+7100000{i:04d}", email=f"dentist{i}@test",
+                role=UserRole.dentist, password_hash="x",
+            )
+            for i in range(count)
+        ]
+        session.add_all(dentists)
+        await session.commit()
+        return [dentist.id for dentist in dentists]
+
+
+async def _book(seed, dentist_id: int, start: datetime) -> int:
+    data = VisitCreate(
+        patient_id=seed.patient_id,
+        dentist_id=dentist_id,
+        date=start,
+        duration_minutes=30,
+    )
+    async with AsyncSessionLocal() as session:
+        try:
+            await create_visit_by_manager(data, db=session, manager=seed.manager, idempotency_key=None)
+            return 201
+        except HTTPException as exc:
+            return exc.status_code
+
+
+async def test_parallel_bookings_never_overlap(seed):
+    """
+    Сотни одновременных бронирований пересекающихся слотов к нескольким врачам:
+    у каждого врача под его блокировкой проходит ровно одно, остальные — 409.
+    """
+    dentist_ids = [seed.dentist_id] + await _add_dentists(DENTISTS - 1)
+
+    # все старты врача в пределах 30 минут — любые два его слота пересекаются
+    bookings = [
+        (dentist_ids[i % DENTISTS], START + timedelta(minutes=(i // DENTISTS) % 30))
+        for i in range(PARALLEL_BOOKINGS)
+    ]
+    statuses = await asyncio.gather(*(_book(seed, dentist_id, start) for dentist_id, start in bookings))
+
+    assert set(statuses) == {201, 409}
+    booked = Counter(dentist_id for (dentist_id, _), status in zip(bookings, statuses) if status == 201)
+    assert booked == {dentist_id: 1 for dentist_id in dentist_ids}
+
+    other = aliased(Visit)
+    async with AsyncSessionLocal() as session:
+        overlaps = await session.execute(
+            select(Visit.dentist_id, func.count())
+            .join(
+                other,
+                and_(
+                    other.dentist_id == Visit.dentist_id,
+                    other.id > Visit.id,
+                    other.date < Visit.end_date,
+                    other.end_date > Visit.date,
+                ),
+            )
+            .group_by(Visit.dentist_id)
+        )
+        per_dentist = await session.execute(select(Visit.dentist_id, func.count()).group_by(Visit.dentist_id))
+    assert overlaps.all() == []
+    assert dict(per_dentist.all()) == {dentist_id: 1 for dentist_id in dentist_ids}
+
+
+async def test_schedule_lock_does_not_block_other_dentists(seed):
+    """Пока расписание одного врача заблокировано, бронирование к другому проходит."""
+    busy_dentist, free_dentist = seed.dentist_id, (await _add_dentists(1))[0]
+
+    async with AsyncSessionLocal() as holder:
+        await _lock_dentist_schedule(holder, busy_dentist)
+
+        waiting = asyncio.create_task(_book(seed, busy_dentist, START))
+        assert await asyncio.wait_for(_book(seed, free_dentist, START), timeout=5) == 201
+        await asyncio.sleep(0.2)
+        assert not waiting.done()
+
+        await holder.rollback()
+    assert await asyncio.wait_for(waiting, timeout=5) == 201
+
+
+async def test_completion_cannot_stretch_over_next_visit(seed):
+    """Новая длительность при завершении проверяется на пересечения, как бронь."""
+    visit_ids = []
+    for hour in (10, 11):
+        data = VisitCreate(
+            patient_id=seed.patient_id,
+            dentist_id=seed.dentist_id,
+            date=datetime(2026, 3, 2, hour),
+            duration_minutes=30,
+        )
+        async with AsyncSessionLocal() as session:
+            body = await create_visit_by_manager(data, db=session, manager=seed.manager, idempotency_key=None)
+            visit_ids.append(body["id"])
+
+    dentist = SimpleNamespace(id=seed.dentist_id)
+    async with AsyncSessionLocal() as session:
+        with pytest.raises(HTTPException) as exc:
+            await complete_visit_by_dentist(
+                visit_ids[0],
+                VisitCompleteByDentist(total_amount=100.0, duration_minutes=120),
+                db=session,
+                dentist=dentist,
+            )
+    assert exc.value.status_code == 409
+
+    # укоротить или продлить до соседнего визита можно
+    async with AsyncSessionLocal() as session:
+        visit = await complete_visit_by_dentist(
+            visit_ids[0],
+            VisitCompleteByDentist(total_amount=100.0, duration_minutes=60),
+            db=session,
+            dentist=dentist,
+        )
+    assert visit.end_date == datetime(2026, 3, 2, 11)
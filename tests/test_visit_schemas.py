@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.visit import MAX_VISIT_DURATION_MIN
+from app.schemas.visit import VisitBulkCreate, VisitCompleteByDentist, VisitCreate
+
+
+def test_start_dates_from_recurrence():
+    data = VisitBulkCreate(
+        patient_id=1,
+        dentist_id=2,
+        recurrence={"start": "2026-03-02T10:00:00", "interval_days": 14, "count": 3},
+    )
+    assert data.start_dates() == [
+        datetime(2026, 3, 2, 10),
+        datetime(2026, 3, 16, 10),
+        datetime(2026, 3, 30, 10),
+    ]
+
+
+def test_start_dates_from_explicit_dates():
+    dates = [datetime(2026, 3, 5, 9), datetime(2026, 3, 2, 9)]
+    data = VisitBulkCreate(patient_id=1, dentist_id=2, dates=dates)
+    assert data.start_dates() == dates
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {},
+        {"dates": ["2026-03-02T10:00:00"], "recurrence": {"start": "2026-03-02T10:00:00", "count": 1}},
+        {"dates": []},
+        {"recurrence": {"start": "2026-03-02T10:00:00", "count": 101}},
+    ],
+)
+def test_invalid_bulk_requests(extra):
+    with pytest.raises(ValidationError):
+        VisitBulkCreate(patient_id=1, dentist_id=2, **extra)
+
+
+def test_duration_is_capped():
+    VisitCreate(patient_id=1, dentist_id=2, date="2026-03-02T10:00:00", duration_minutes=MAX_VISIT_DURATION_MIN)
+    with pytest.raises(ValidationError):
+        VisitCreate(
+            patient_id=1, dentist_id=2, date="2026-03-02T10:00:00", duration_minutes=MAX_VISIT_DURATION_MIN + 1
+        )
+    with pytest.raises(ValidationError):
+        VisitCompleteByDentist(total_amount=100, duration_minutes=MAX_VISIT_DURATION_MIN + 1)